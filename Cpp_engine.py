@@ -1,36 +1,24 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-import problem_engine
-import re
+import time
+from contextlib import contextmanager
 
-def _translate_update_to_python(update_str: str) -> str:
-    """
-    Convert common C++ update idioms to python-evaluable code.
-    Examples:
-      i++       -> i = i + 1
-      i--       -> i = i - 1
-      i += 2    -> i = i + 2
-      i *= 2    -> i = i * 2
-    """
-    s = update_str.strip()
-    # handle i++ and ++i and i-- and --i
-    s = re.sub(r'(\w+)\s*\+\+', r'\1 = \1 + 1', s)
-    s = re.sub(r'\+\+\s*(\w+)', r'\1 = \1 + 1', s)
-    s = re.sub(r'(\w+)\s*--', r'\1 = \1 - 1', s)
-    s = re.sub(r'--\s*(\w+)', r'\1 = \1 - 1', s)
-    # replace C-style compound assignment to python-compatible form (they are already compatible)
-    # ensure single equals assignment stays as-is ("i = i + 1")
-    return s
-
-def _safe_eval(expr: str, local_vars: dict):
-    """
-    Evaluate a simple arithmetic/variable expression using only local_vars.
-    Returns the evaluated Python value or raise.
-    """
-    # Permit only digits, letters, underscores, operators, parentheses and spaces
-    if not re.fullmatch(r'[A-Za-z0-9_+\-*/%() \t]+', expr):
-        raise ValueError(f"Unsafe or unsupported expression: {expr}")
-    return eval(expr, {}, local_vars)
+from cpp_expr import ExprError, compile_expr, convert, string_literal
+from cpp_interpreter import DEFAULT_VALUES, ExecutionError, StepLimitExceeded, Trace, compile_cout, run_program
+from cpp_parser import ParseError, normalize_text, parse_program, source_tokens
+import lesson_registry
+from patterns import DIGITS
+
+# The types the lessons teach; extract_vars reports only these
+LESSON_TYPES = ("int", "string", "float")
+
+def _as_program(code):
+    """Accept raw source or an already-parsed program."""
+    if isinstance(code, str):
+        return parse_program(code)
+    return code
+
+def _scope(vars_dict: dict):
+    """Flat {name: value} scope for the expression evaluator."""
+    return {name: info["value"] for name, info in vars_dict.items()}
 
 def safe_int(value):
     try:
@@ -38,326 +26,134 @@ def safe_int(value):
     except:
         return None
 
+def _unconditional_decls(nodes, found):
+    """
+    Add to `found` the declarations in `nodes` that run unconditionally
+    before any statement that could change a variable: the only ones whose
+    declared values are sure to be the values they run with. Returns False
+    once such a statement is reached.
+    """
+    for node in nodes:
+        kind = node["kind"]
+        if kind == "decl":
+            found.add(id(node))
+        elif kind == "block" and node["text"]:
+            # int a = 1, b = 2;
+            found.update(id(decl) for decl in node["body"])
+        elif kind == "function":
+            # only main() runs
+            if node["name"] == "main" and not _unconditional_decls(node["body"], found):
+                return False
+        elif kind == "cout":
+            try:
+                if any(compile_expr(part).assigns for part in node["parts"]):
+                    return False
+            except ExprError:
+                return False
+        elif not (kind == "expr" and node["text"].startswith("using ")):
+            return False
+    return True
+
 def extract_vars(code):
+    program = _as_program(code)
+    unconditional = set()
+    _unconditional_decls(program["body"], unconditional)
     vars_dict = {}
-
-    # Matches: int x = 5;   float y = a + 3;   string name = "Alex";
-    pattern = r'(int|string|float)\s+(\w+)\s*=\s*([^;]+);'
-
-    for match in re.finditer(pattern, code):
-        dtype, name, rhs = match.groups()
-        rhs = rhs.strip()
-
-        # 1. Handle string values
-        if dtype == "string":
-            if rhs.startswith('"') and rhs.endswith('"'):
-                clean = rhs[1:-1]
-            else:
-                clean = rhs
-            vars_dict[name] = {"type": "string", "value": clean}
+    scope = {}
+
+    # Declarations like: int x = 5;   float y = a + 3;   string name = "Alex";
+    # Every declared name goes in the scope so later initializers can use it
+    # (int code = c; with char c); only the lesson types are reported.
+    for decl in program["decls"]:
+        dtype, name, rhs = decl["dtype"], decl["name"], decl["rhs"]
+        if rhs is None:
+            scope[name] = DEFAULT_VALUES.get(dtype, 0)
             continue
+        rhs = rhs.strip()
 
-        # 2. Preprocess some C++ shorthand operators
-        rhs = rhs.replace("++", "+1")
-        rhs = rhs.replace("--", "-1")
-        rhs = rhs.replace("+=", "+")
-        rhs = rhs.replace("-=", "-")
-        rhs = rhs.replace("*=", "*")
-        rhs = rhs.replace("/=", "/")
-
-        # 3. Evaluate arithmetic safely
         try:
-            local_vars = {v: vars_dict[v]["value"] for v in vars_dict}
-            if re.fullmatch(r'[A-Za-z0-9_+\-*/() ]+', rhs):
-                evaluated = eval(rhs, {}, local_vars)
+            expr = compile_expr(rhs)
+            value = convert(dtype, expr.evaluate(scope))
+        except ExprError:
+            # 1. Strings that are not string expressions keep their source text
+            if dtype == "string":
+                value = string_literal(rhs) if rhs.startswith('"') else normalize_text(rhs)
+            # 2. Other types are left for the run to report, and so are
+            #    declarations in loops or branches or after statements that
+            #    change variables: they may run with other values (int q = 6 / d;
+            #    after d++) or not at all
+            elif dtype not in LESSON_TYPES or id(decl) not in unconditional:
+                continue
+            elif dtype == "int":
+                raise ValueError(f"Invalid integer assignment for '{name}': {normalize_text(rhs)}")
             else:
-                evaluated = rhs
-        except:
-            evaluated = rhs
+                raise ValueError(f"Invalid float assignment for '{name}': {normalize_text(rhs)}")
+        else:
+            # 3. Initializers like "x++" also update the variables they assign
+            for assigned in expr.assigns:
+                if assigned in vars_dict:
+                    vars_dict[assigned]["value"] = scope[assigned]
 
-        # 4. Type enforcement
-        if dtype == "int":
-            try:
-                vars_dict[name] = {"type": "int", "value": int(evaluated)}
-            except:
-                raise ValueError(f"Invalid integer assignment for '{name}': {rhs}")
-
-        elif dtype == "float":
-            try:
-                vars_dict[name] = {"type": "float", "value": float(evaluated)}
-            except:
-                raise ValueError(f"Invalid float assignment for '{name}': {rhs}")
+        scope[name] = value
+        if dtype in LESSON_TYPES:
+            vars_dict[name] = {"type": dtype, "value": value}
 
     return vars_dict
 
-def _render_cout_statement(stmt: str, scope: dict, globals_vars: dict):
-    """
-    Render a single cout << ...; statement fragment (no trailing ;) using provided scope.
-    scope: local per-loop variables
-    globals_vars: global declared variables from extract_vars
-    """
-    parts = [p.strip() for p in re.split(r'<<', stmt)]
-    rendered = ""
-    for part in parts:
-        if not part:
-            continue
-        # literal string
-        if part.startswith('"') and part.endswith('"'):
-            rendered += part[1:-1]
-            continue
-        # endl
-        if part == "endl":
-            rendered += "\n"
-            continue
-        # numeric literal
-        if re.fullmatch(r'\d+', part):
-            rendered += part
-            continue
-        # variable in scope
-        if part in scope:
-            rendered += str(scope[part])
-            continue
-        # variable in globals
-        if part in globals_vars:
-            rendered += str(globals_vars[part]["value"])
-            continue
-        # expression e.g. a + b
-        try:
-            local_vars = {}
-            local_vars.update({k: globals_vars[k]["value"] for k in globals_vars})
-            local_vars.update(scope)
-            val = _safe_eval(part, local_vars)
-            rendered += str(val)
-            continue
-        except Exception:
-            raise ValueError(f"Unknown identifier or invalid expression in cout: '{part}'")
-    return rendered
-
-
-def check_prints(code: str, vars_dict: dict):
-    cout_statements = re.findall(r'\bcout\s*<<\s*([^;]+);', code, re.MULTILINE)
+def check_prints(code, vars_dict: dict):
+    scope = _scope(vars_dict)
     output_lines = []
 
-    for stmt in cout_statements:
-        parts = re.split(r'<<', stmt)
-        rendered = ""
-
-        for part in parts:
-            part = part.strip()
-
-            if not part:
-                continue
-
-            # Literal string
-            if part.startswith('"') and part.endswith('"'):
-                rendered += part[1:-1]
-                continue
-
-            # endl
-            if part == "endl":
-                rendered += "\n"
-                continue
-
-            # Existing variable
-            if part in vars_dict:
-                rendered += str(vars_dict[part]["value"])
-                continue
-
-            # Very limited expression support
-            if re.fullmatch(r'[A-Za-z0-9_+\-*/ ]+', part):
-                try:
-                    local_vars = {v: vars_dict[v]["value"] for v in vars_dict}
-                    val = eval(part, {}, local_vars)
-                    rendered += str(val)
-                    continue
-                except:
-                    raise ValueError(f"Invalid expression in cout: '{part}'")
-
-            raise ValueError(f"Unknown identifier in cout: '{part}'")
-
-        output_lines.append(rendered)
+    for stmt in _as_program(code)["couts"]:
+        output_lines.append(compile_cout(tuple(stmt["parts"]))(scope))
 
     return "\n".join(output_lines)
 
 
-def simulate_for_loops(code: str, globals_vars: dict):
-    """
-    Minimal, stable for-loop simulator for:
-        for (init; condition; update) {
-            cout << ...;
-        }
-
-    Supports simple integer loops required for Lessons 4 and 5.
-    """
-    output = ""
-
-    # match for(...) { ... }
-    pattern = re.compile(r'for\s*\(([^)]*)\)\s*\{([^}]*)\}', re.DOTALL)
-    matches = pattern.findall(code)
-
-    for header, body in matches:
-        # Split initializer ; condition ; update
-        parts = [p.strip() for p in header.split(";")]
-        if len(parts) != 3:
-            continue
-
-        init_code, cond_code, update_code = parts
-
-        # Create a loop-local scope
-        # this allows ANY declared int, float, string to be used in the loop
-        scope = {k: globals_vars[k]["value"] for k in globals_vars}
-
-
-        # ---------------------------
-        # 1. Process initializer
-        # ---------------------------
-        # e.g. int i = 0  OR  i = 0
-        init_match = re.match(r'(?:int|float)?\s*(\w+)\s*=\s*(.+)', init_code)
-        if init_match:
-            var_name = init_match.group(1)
-            rhs = init_match.group(2).strip()
-            try:
-                scope[var_name] = eval(rhs, {}, scope)
-            except:
-                continue  # cannot init → skip loop
-        else:
-            # i++ or i += 1
-            try:
-                exec(_translate_update_to_python(init_code), {}, scope)
-            except:
-                continue
-
-        # ---------------------------
-        # Extract couts from body
-        # ---------------------------
-        body_couts = re.findall(r'cout\s*<<\s*([^;]+);', body)
-        if not body_couts:
-            continue  # nothing to print
-
-        # ---------------------------
-        # 2. Execute loop
-        # ---------------------------
-        iterations = 0
-        MAX_ITER = 200
-
-        while True:
-            iterations += 1
-            if iterations > MAX_ITER:
-                break  # safety
-
-            try:
-                cond_val = eval(cond_code, {}, scope)
-            except:
-                # If condition cannot be evaluated, assume TRUE so the
-                # simulator still produces correct lesson-required output.
-                cond_val = True
-
-
-            if not cond_val:
-                break
-
-            # Execute all couts per iteration
-            for stmt in body_couts:
-                rendered = _render_cout_statement(stmt, scope, globals_vars)
-                output += rendered
-
-            # Apply update
-            try:
-                exec(_translate_update_to_python(update_code), {}, scope)
-            except:
-                break  # invalid update → stop loop
-
-    return output
-
-
-
-def simulate_while_loops(code, vars_dict):
-    loop_pattern = r'while\s*\((.*?)\)\s*\{([^}]*)\}'
-    loops = re.findall(loop_pattern, code, re.DOTALL)
-
-    output = ""
+@contextmanager
+def timed(timings: dict, stage: str):
+    """Add the time spent in the with-block to timings[stage] (seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
 
-    for condition, body in loops:
-        # Clean loop body into individual statements
-        statements = [stmt.strip() for stmt in body.split(";") if stmt.strip()]
 
-        # Run loop with safety limit
-        for _ in range(100):  # prevents infinite loops
-            try:
-                cond_val = eval(condition, {}, {v: vars_dict[v]["value"] for v in vars_dict})
-            except:
-                break
-
-            if not cond_val:
-                break
-
-            # Execute each statement inside loop
-            for stmt in statements:
-                # Handle cout inside loop
-                if stmt.startswith("cout"):
-                    try:
-                        printed = check_prints(stmt + ";", vars_dict)
-                        output += printed
-                    except:
-                        pass
-                    continue
-
-                # Handle variable updates like: i = i + 1
-                if "=" in stmt:
-                    left, right = stmt.split("=", 1)
-                    left = left.strip()
-                    right = right.strip()
-
-                    try:
-                        new_val = eval(right, {}, {v: vars_dict[v]["value"] for v in vars_dict})
-                    except:
-                        continue
-
-                    # Update variable
-                    if left in vars_dict:
-                        vars_dict[left]["value"] = new_val
-
-    return output
-
-def simulate_if_statements(code, vars_dict):
-    if_pattern = r'if\s*\((.*?)\)\s*\{([^}]*)\}'
-    else_pattern = r'else\s*\{([^}]*)\}'
-
-    if_blocks = re.findall(if_pattern, code, re.DOTALL)
-    else_blocks = re.findall(else_pattern, code, re.DOTALL)
-
-    output = ""
-
-    for idx, (condition, body) in enumerate(if_blocks):
-        try:
-            cond_val = eval(condition, {}, {v: vars_dict[v]["value"] for v in vars_dict})
-        except:
-            continue
+# Evaluate full C++-like code
+def evaluate_output(code: str, trace_cap: int = 0, session=None, stream=None, timings=None):
+    """
+    Run a submission. With trace_cap > 0, "loop_trace" holds an execution
+    trace (see cpp_interpreter.Trace) of at most trace_cap steps.
 
-        if cond_val:
-            # run ONLY the IF block
-            stmts = [s.strip() for s in body.split(";") if s.strip()]
-            for stmt in stmts:
-                if stmt.startswith("cout"):
-                    output += check_prints(stmt + ";", vars_dict)
-            return output  # if-branch executed → stop here
+    `session` is an optional cpp_interpreter.LiveProgram holding the
+    student's previous version of this program; only the part from the
+    first changed line on is parsed and run again. The caller holds its lock.
 
-        # If false, try ELSE block at same index
-        if idx < len(else_blocks):
-            else_body = else_blocks[idx]
-            stmts = [s.strip() for s in else_body.split(";") if s.strip()]
-            for stmt in stmts:
-                if stmt.startswith("cout"):
-                    output += check_prints(stmt + ";", vars_dict)
-            return output
+    `stream` is an optional cpp_interpreter.OutputStream that is sent the
+    program's output while it runs; cancelling it raises RunCancelled.
 
-    return output
+    Seconds spent in each stage (parse, extract_vars, check_prints, run) are
+    added to `timings` when a dict is given.
+    """
+    if timings is None:
+        timings = {}
 
+    # Lex + parse once; every pass below walks the same program
+    try:
+        with timed(timings, "parse"):
+            program = session.update(code) if session is not None else parse_program(code)
+    except ParseError as e:
+        return {
+            "success": False,
+            "error": f"Syntax error: {e}",
+            "output": "",
+            "variables": {}
+        }
 
-# Evaluate full C++-like code
-def evaluate_output(code: str):
     try:
-        v_dict = extract_vars(code)
+        with timed(timings, "extract_vars"):
+            v_dict = extract_vars(program)
     except Exception as e:
         return {
             "success": False,
@@ -366,101 +162,87 @@ def evaluate_output(code: str):
             "variables": {}
         }
 
-    trimmed = code.strip()
+    # The checks below look at tokens, not raw text, and messages quote code
+    # through normalize_text, so every source with the same result-cache key
+    # (comments/whitespace aside) gets the same answer
+    tokens = source_tokens(code)
 
     #  Reject pure numbers like "16"
-    if re.fullmatch(r"\d+", trimmed):
+    if len(tokens) == 1 and DIGITS.fullmatch(tokens[0][1]):
         return {"success": False, "error": "This is not valid C++ code. You must declare a variable and print it with cout."}
 
     #  Reject code that has no semicolon
-    if ";" not in code:
+    if not any(tok[1] == ";" for tok in tokens):
         return {"success": False, "error": "Missing semicolon — this is not valid C++ code."}
 
     #  Reject code that never declares a variable
-    if not re.search(r"(int|string|float)\s+\w+\s*=", code):
+    if not any(d["dtype"] in LESSON_TYPES and d["rhs"] is not None
+               for d in program["decls"]):
         return {"success": False, "error": "You must declare a variable using int, string, or float."}
 
     #  Reject code without cout
-    if "cout" not in code:
+    if not program["couts"]:
         return {"success": False, "error": "You must print output using cout."}
 
-    # Try to evaluate prints
+    # 1. RAW STUDENT OUTPUT: every cout in source order, rendered once with the
+    #    declared values. Couts that only make sense at run time (6 / d with d
+    #    changed in a loop) can't be rendered that way; the run's output stands
+    #    in for them below, and real errors are reported by the run.
     try:
-        output = check_prints(code, v_dict)
-
-        # simulate if/else
-        if_output = simulate_if_statements(code, v_dict)
+        with timed(timings, "check_prints"):
+            raw_output = check_prints(program, v_dict)
+    except Exception:
+        raw_output = None
 
-        #remove wrongly printed unconditional couts
-        base_output = ""
-
-    except Exception as e:
+    # 2. RUN THE PROGRAM (statements in execution order)
+    trace = Trace(trace_cap) if trace_cap > 0 else None
+    try:
+        with timed(timings, "run"):
+            if session is not None and trace is None:
+                final_output = session.run(trace=stream)
+            else:
+                final_output = run_program(code, trace=trace if trace is not None else stream)
+    except StepLimitExceeded:
         return {
             "success": False,
-            "error": f"...",
+            "error": "Your program ran too long — check for an infinite loop.",
             "output": "",
-            "variables": {},
-            "loop_trace": []
-    }
-    # 1. RAW STUDENT OUTPUT
-    try:
-        raw_output = check_prints(code, v_dict)
-    except:
-        raw_output = ""
-
-    # 2. SIMULATION
-    if_output = simulate_if_statements(code, v_dict)
-    for_output = simulate_for_loops(code, v_dict)
-    loop_output = simulate_while_loops(code, v_dict)
-
-    # 3. FINAL OUTPUT
-    final_output = for_output + loop_output + if_output
+            "variables": v_dict,
+            "loop_trace": trace.to_dict() if trace else []
+        }
+    except ExecutionError as e:
+        return {
+            "success": False,
+            "error": f"Runtime error: {e}",
+            "output": "",
+            "variables": v_dict,
+            "loop_trace": trace.to_dict() if trace else []
+        }
 
+    if raw_output is None:
+        raw_output = final_output
 
     return {
     "success": True,
     "output": final_output,
     "raw_output": raw_output,
     "variables": v_dict,
-    "loop_trace": []
+    "loop_trace": trace.to_dict() if trace else []
     }
 
 
-def generate_expected_output(task):
-    scope = dict(task["init_values"])
-    output = ""
-
-    while eval(task["condition"], {}, scope):
-        cout = task["cout_template"] + str(scope["i"])
-        output += cout
-
-        # apply updates
-        updates = task["update"]
-        if not isinstance(updates, list):
-            updates = [updates]
-
-        for upd in updates:
-            exec(upd, {}, scope)
-
-    return output
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+def evaluate_timed(code: str, trace_cap: int = 0, session=None, stream=None):
+    """
+    evaluate_output and its stage timings, as (result, {stage: seconds}).
+    This is what the server runs in its engine pool: worker processes only
+    need to import the engine for it, not the web app.
+    """
+    timings = {}
+    return evaluate_output(code, trace_cap, session, stream, timings), timings
 
 
+def generate_expected_output(task):
+    return "".join(
+        task["cout_template"] + str(scope["i"])
+        for scope in lesson_registry.run_task_loop(task)
+    )
@@ -0,0 +1,91 @@
+# bench_corpus.py
+#
+# Realistic student submissions per lesson, shared by the engine benchmarks
+# (bench_engine.py) and the load generator. Each lesson has cases named
+#   correct_*      passes every check
+#   wrong_*        runs, but fails a check (or is rejected before running)
+#   loop_*         pathological loops (infinite, or close to the step budget)
+#   cout_*         long cout chains / lots of output
+
+_LONG_CHAIN = " << \" \" << ".join(["age"] * 40)
+
+CORPUS = {
+    "lesson1": {
+        "correct": "int age = 16;\ncout << age;",
+        "correct_expr": "int age = 8 + 8;\ncout << age << endl;",
+        "wrong_value": "int age = 15;\ncout << age;",
+        "wrong_no_cout": "int age = 16;",
+        "wrong_type": "float age = 16;\ncout << age;",
+        "wrong_syntax": "int age = 16\ncout<<age",
+        "cout_chain": f"int age = 16;\ncout << {_LONG_CHAIN} << endl;",
+        "cout_lines": "int age = 16;\n" + "cout << \"Age: \" << age << endl;\n" * 60,
+    },
+    "lesson2": {
+        "correct": "string name = \"Alex\";\ncout << name;",
+        "correct_greeting": "string name = \"Alex\";\ncout << \"Hi \" << name << \"!\" << endl;",
+        "wrong_value": "string name = \"Bob\";\ncout << name;",
+        "wrong_type": "int name = 5;\ncout << name;",
+        "cout_chain": "string name = \"Alex\";\ncout << " + " << \", \" << ".join(["name"] * 40) + ";",
+    },
+    "lesson3": {
+        "correct": "int x = 5;\nif (x > 3) {\n    cout << \"Greater\";\n} else {\n    cout << \"Smaller\";\n}",
+        "correct_else_if": (
+            "int x = 5;\nif (x > 10) {\n    cout << \"Huge\";\n} else if (x > 3) {\n    cout << \"Greater\";\n}"
+            " else {\n    cout << \"Smaller\";\n}"
+        ),
+        "wrong_branch": "int x = 5;\nif (x > 3) { cout << \"Smaller\"; }",
+        "correct_small_x": "int x = 1;\nif (x > 3) {\n    cout << \"Greater\";\n} else {\n    cout << \"Smaller\";\n}",
+        "loop_in_branch": (
+            "int x = 5;\nif (x > 3) {\n    int n = 0;\n    while (n < 2000) {\n        n++;\n    }\n"
+            "    cout << \"Greater\";\n}"
+        ),
+    },
+    "lesson4": {
+        "correct": "int limit = 3;\nfor (int i = 0; i < limit; i++) {\n    cout << \"iteration \" << i;\n}",
+        "correct_while": (
+            "int limit = 3;\nint i = 0;\nwhile (i < limit) {\n    cout << \"iteration \" << i;\n    i = i + 1;\n}"
+        ),
+        "wrong_text": "int limit = 3;\nfor (int i = 0; i < 3; i++) {\n    cout << \"Iteration \" << i;\n}",
+        "wrong_unknown_name": "int limit = 3;\nfor (int i = 0; i < limit; i++) {\n    cout << \"iteration \" << q;\n}",
+        "loop_infinite": "int limit = 3;\nfor (int i = 0; i < limit; i--) {\n    cout << \"iteration \" << i;\n}",
+        "loop_near_budget": (
+            "int limit = 3000;\nint total = 0;\nfor (int i = 0; i < limit; i++) {\n    total += i % 7;\n}\n"
+            "cout << \"iteration \" << total;"
+        ),
+        "cout_loop": (
+            "int limit = 300;\nfor (int i = 0; i < limit; i++) {\n"
+            "    cout << \"iteration \" << i << \" \" << i * 2 << \" \" << limit - i << endl;\n}"
+        ),
+    },
+    "lesson5": {
+        "correct": (
+            "int limit = 4;\nint i = 0;\nint value = 10;\nif (limit % 2 == 1) {\n    cout << \"Odd\";\n} else {\n"
+            "    cout << \"Even\";\n}\nwhile (i < limit) {\n    cout << \"loop: \" << value;\n    i = i + 1;\n"
+            "    value = value * 2;\n}"
+        ),
+        "wrong_loop": (
+            "int limit = 4;\nint i = 0;\nint value = 10;\nif (limit % 2 == 1) {\n    cout << \"Odd\";\n} else {\n"
+            "    cout << \"Even\";\n}\nfor (int j = 0; j < limit; j++) {\n    cout << \"loop: \" << value;\n}"
+        ),
+        "wrong_no_loop": "int limit = 4;\nint i = 0;\nint value = 10;\ncout << \"Even\";",
+        "loop_infinite": (
+            "int limit = 4;\nint i = 0;\nint value = 10;\nwhile (i < limit) {\n    cout << \"loop: \" << value;\n"
+            "    value = value * 2;\n}"
+        ),
+        "loop_nested": (
+            "int limit = 4;\nint i = 0;\nint value = 10;\nfor (int a = 0; a < 40; a++) {\n"
+            "    for (int b = 0; b < 40; b++) {\n        value = (value * 3 + b) % 1000;\n    }\n}\n"
+            "cout << \"loop: \" << value;"
+        ),
+    },
+}
+
+
+def cases(lesson_ids=None):
+    """(lesson_id, case_name, code) for every corpus entry, optionally for some lessons only."""
+    return [
+        (lesson_id, name, code)
+        for lesson_id, submissions in CORPUS.items()
+        if lesson_ids is None or lesson_id in lesson_ids
+        for name, code in submissions.items()
+    ]
@@ -0,0 +1,256 @@
+# bench_engine.py
+#
+# Benchmarks for the engine hot paths over bench_corpus.CORPUS:
+#
+#   python bench_engine.py                  run, print ops/sec + min/p50/p99, compare with the baseline
+#   python bench_engine.py --save           run and store the results as the new baseline
+#   python bench_engine.py -k lesson4/loop  only cases whose "lesson/case/stage" name contains this
+#
+# Each case times every stage of the pipeline on its own: parse_program,
+# compile_program, extract_vars, check_prints, run_program (execution only),
+# evaluate_output end to end and the lesson's validator. By default the
+# parse/compile caches are cleared before every call, as for a submission the
+# server has not seen before (--warm keeps them).
+#
+# With a baseline, the run exits with status 1 when the end-to-end
+# (evaluate_output) cases are together more than --threshold slower: the
+# geometric mean of their fastest-call ratios, after a fixed calibration
+# workload timed in the same run absorbs a machine that is slower today. Any
+# single case, and every per-stage number, swings by tens of percent between
+# runs on a busy machine, so those are only reported. Baselines are per
+# machine, so they are not checked in.
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import bench_corpus
+import lesson_validators
+from Cpp_engine import check_prints, evaluate_output, extract_vars
+from cpp_expr import compile_expr
+from cpp_interpreter import compile_cout, compile_program, run_program
+from cpp_parser import source_tokens, parse_program
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+# Stages whose slowdown fails the run
+GATED_STAGES = ("evaluate_output",)
+
+# Memoized compile steps that a new submission would miss
+_COMPILE_CACHES = (source_tokens, parse_program, compile_program, compile_expr, compile_cout)
+
+
+def _calibration():
+    """Fixed pure-Python workload (dicts, calls, string ops) timed next to every case."""
+    scope = {}
+    for i in range(200):
+        scope[f"v{i % 16}"] = scope.get(f"v{(i + 1) % 16}", 0) + i
+    return "".join(str(v) for v in scope.values())
+
+
+CALIBRATION = "calibration"
+# Benchmarks run between calibration samples within a round
+CALIBRATION_EVERY = 8
+
+
+def clear_compile_caches():
+    for cached in _COMPILE_CACHES:
+        cached.cache_clear()
+
+
+def stages(lesson_id, code):
+    """(stage name, zero-argument callable) for each pipeline stage this submission reaches."""
+    program = parse_program(code)
+    compiled = compile_program(code)
+    result = evaluate_output(code)
+    validator = getattr(lesson_validators, f"{lesson_id}_validator")
+
+    found = [
+        ("parse_program", lambda: parse_program(code)),
+        ("compile_program", lambda: compile_program(code)),
+        ("extract_vars", lambda: extract_vars(program)),
+    ]
+    try:
+        v_dict = extract_vars(program)
+    except Exception:
+        v_dict = None
+    if v_dict is not None:
+        found.append(("check_prints", lambda: check_prints(program, v_dict)))
+    found.append(("run_program", lambda: run_program(compiled)))
+    found.append(("evaluate_output", lambda: evaluate_output(code)))
+    if result["success"]:
+        found.append(("validator", lambda: validator(code, result)))
+    return found
+
+
+def sample(fn, cold=True, min_time=0.02, min_calls=5, max_calls=20_000):
+    """
+    Per-call times (seconds) of calling fn for at least min_time seconds and
+    min_calls calls. Exceptions are part of the work being measured.
+    """
+    clock = time.perf_counter
+    samples = []
+    deadline = clock() + min_time
+    while len(samples) < min_calls or (len(samples) < max_calls and clock() < deadline):
+        if cold:
+            clear_compile_caches()
+        start = clock()
+        try:
+            fn()
+        except Exception:
+            pass
+        samples.append(clock() - start)
+    return samples
+
+
+def summarize(rounds):
+    """
+    {"calls", "ops_per_sec", "min", "p50", "p99"} from several rounds of
+    samples. min is the fastest call, the least noisy measure of the work
+    itself; p50 is the lowest per-round median, so load from elsewhere on
+    the machine during one round doesn't read as a median change; p99 is
+    over every call.
+    """
+    samples = sorted(t for round_samples in rounds for t in round_samples)
+    n = len(samples)
+    return {
+        "calls": n,
+        "ops_per_sec": n / sum(samples),
+        "min": samples[0],
+        "p50": min(sorted(round_samples)[len(round_samples) // 2] for round_samples in rounds),
+        "p99": samples[min(n - 1, int(n * 0.99))],
+    }
+
+
+def run_benchmarks(pattern="", cold=True, min_time=0.1, rounds=5):
+    """
+    {"lesson/case/stage": summarize(...)} for every corpus case and stage
+    matching pattern, plus the CALIBRATION workload. The rounds are
+    interleaved — each one walks every case — so a slow patch on the
+    machine is spread over all cases instead of landing on a few of them,
+    and the calibration is timed every CALIBRATION_EVERY cases throughout.
+    """
+    benchmarks = [(CALIBRATION, _calibration)] + [
+        (f"{lesson_id}/{case}/{stage}", fn)
+        for lesson_id, case, code in bench_corpus.cases()
+        for stage, fn in stages(lesson_id, code)
+        if pattern in f"{lesson_id}/{case}/{stage}"
+    ]
+    for _, fn in benchmarks:  # warm-up
+        sample(fn, cold, min_time=0, min_calls=3)
+
+    collected = {name: [] for name, _ in benchmarks}
+    for _ in range(rounds):
+        for i, (name, fn) in enumerate(benchmarks):
+            if i and i % CALIBRATION_EVERY == 0:
+                collected[CALIBRATION].append(sample(_calibration, cold, min_time / rounds))
+            collected[name].append(sample(fn, cold, min_time / rounds))
+    return {name: summarize(samples) for name, samples in collected.items()}
+
+
+def environment(cold):
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cold": cold,
+    }
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, cold):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(cold), "results": results}, f, indent=1, sort_keys=True)
+
+
+def is_gated(name):
+    return name.rsplit("/", 1)[-1] in GATED_STAGES
+
+
+def compare(results, baseline):
+    """
+    ({name: ratio new/old of the fastest call} for cases in both runs,
+    geometric mean of the ratios of the GATED_STAGES cases, or None).
+
+    When this run's CALIBRATION is slower than the baseline's, the ratios
+    are scaled down to match, so a machine that is slower today (CPU
+    frequency, noisy neighbours on a VM) does not show up as a change. They
+    are never scaled up: the small calibration workload hits a fast moment
+    more easily than the engine cases do, which would read as a slowdown.
+    """
+    old_results = baseline["results"]
+    scale = 1.0
+    if CALIBRATION in results and "min" in old_results.get(CALIBRATION, {}):
+        scale = min(1.0, old_results[CALIBRATION]["min"] / results[CALIBRATION]["min"])
+
+    ratios = {}
+    for name, result in results.items():
+        old = old_results.get(name)
+        if old and "min" in old and name != CALIBRATION:
+            ratios[name] = result["min"] * scale / old["min"]
+    gated = [ratio for name, ratio in ratios.items() if is_gated(name)]
+    if not gated:
+        return ratios, None
+    return ratios, math.exp(sum(map(math.log, gated)) / len(gated))
+
+
+def report(results, ratios, out=sys.stdout):
+    width = max(map(len, results), default=0)
+    out.write(f"{'case':<{width}}  {'ops/sec':>10}  {'min us':>9}  {'p50 us':>9}  {'p99 us':>9}  {'vs base':>8}\n")
+    for name, r in results.items():
+        change = f"{(ratios[name] - 1) * 100:+7.1f}%" if name in ratios else "     new"
+        out.write(
+            f"{name:<{width}}  {r['ops_per_sec']:10.0f}  {r['min'] * 1e6:9.1f}  {r['p50'] * 1e6:9.1f}"
+            f"  {r['p99'] * 1e6:9.1f}  {change:>8}\n"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Cpp_engine hot paths.")
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose lesson/case/stage contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fail when the end-to-end cases are this much slower than the baseline (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds to spend on each case")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over the cases (fastest call wins)")
+    parser.add_argument("--warm", action="store_true", help="keep the parse/compile caches between calls")
+    args = parser.parse_args(argv)
+
+    cold = not args.warm
+    results = run_benchmarks(args.filter, cold=cold, min_time=args.min_time, rounds=args.rounds)
+
+    baseline = None if args.save else load_baseline(args.baseline)
+    if baseline is not None and baseline.get("environment") != environment(cold):
+        print(f"note: baseline was recorded with {baseline.get('environment')}", file=sys.stderr)
+    ratios, change = compare(results, baseline) if baseline else ({}, None)
+    if args.save:
+        save_baseline(args.baseline, results, cold)
+    report(results, ratios)
+
+    if args.save:
+        print(f"Saved {len(results)} results to {args.baseline}")
+    elif baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save to record one.")
+    elif change is not None:
+        print(f"\nEnd-to-end ({', '.join(GATED_STAGES)}) vs baseline: {(change - 1) * 100:+.1f}%")
+        if change > 1 + args.threshold:
+            print(f"More than {args.threshold:.0%} slower. Slowest cases:")
+            for name in sorted(filter(is_gated, ratios), key=ratios.get, reverse=True)[:5]:
+                print(f"  {name}: {(ratios[name] - 1) * 100:+.1f}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,638 @@
+import math
+import operator
+from cpp_parser import TYPE_WORDS, source_cached, tokenize
+
+# -------------------
+# C++ expression compiler
+# -------------------
+#
+# Expressions from student code are parsed once into a small tree and
+# compiled into nested closures evaluate(scope) -> value, where scope is a
+# flat {name: value} dict. Nothing is handed to Python's eval().
+#
+# Values: int (32-bit, wraps on overflow), float, str (std::string),
+# bool (comparison results; prints as 1/0) and Char (char variables and
+# literals; prints as a character, promotes to int in arithmetic, as in
+# C++). Integer division truncates
+# toward zero and % takes the sign of the dividend, as in C++. Every
+# operation is O(1) on 32-bit ints, and strings are capped at
+# MAX_STRING_LENGTH, so the cost of one evaluation is bounded by the
+# length of the expression.
+
+INT_MIN = -2**31
+INT_MAX = 2**31 - 1
+MAX_STRING_LENGTH = 10_000
+
+
+class ExprError(ValueError):
+    """Invalid expression, or an operation C++ would reject / leave undefined."""
+
+
+def wrap_int(n):
+    """Wrap to a signed 32-bit int, as int arithmetic overflows in C++."""
+    if INT_MIN <= n <= INT_MAX:
+        return n
+    return ((n - INT_MIN) & 0xFFFFFFFF) + INT_MIN
+
+
+class Char(int):
+    """A char value: its code point as a signed 8-bit int."""
+
+    __slots__ = ()
+
+
+def _check_string(s):
+    if len(s) > MAX_STRING_LENGTH:
+        raise ExprError("String too long.")
+    return s
+
+
+# ---------------------------
+# operators
+# ---------------------------
+def _type_name(v):
+    if v.__class__ is str:
+        return "string"
+    if v.__class__ is float:
+        return "float"
+    return "int"
+
+
+def _arith(symbol, int_op, float_op):
+    """Binary numeric operator: int op int stays int (wrapped), otherwise float."""
+    def op(a, b):
+        ca, cb = a.__class__, b.__class__
+        if ca is int and cb is int:
+            n = int_op(a, b)
+            return n if INT_MIN <= n <= INT_MAX else wrap_int(n)
+        if ca is str or cb is str:
+            raise ExprError(f"Cannot apply '{symbol}' to {_type_name(a)} and {_type_name(b)}.")
+        if ca is float or cb is float:
+            return float_op(float(a), float(b))
+        return wrap_int(int_op(a, b))
+    return op
+
+
+def _int_only(symbol, int_op):
+    def op(a, b):
+        if a.__class__ in (str, float) or b.__class__ in (str, float):
+            raise ExprError(f"'{symbol}' needs int operands.")
+        return wrap_int(int_op(a, b))
+    return op
+
+
+def _int_div(a, b):
+    if b == 0:
+        raise ExprError("Division by zero.")
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+def _int_mod(a, b):
+    if b == 0:
+        raise ExprError("Division by zero.")
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+
+def _float_div(a, b):
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _shift_count(b):
+    if not 0 <= b < 32:
+        raise ExprError("Shift count out of range.")
+    return b
+
+
+def _add(a, b):
+    ca, cb = a.__class__, b.__class__
+    if ca is str and cb is str:
+        return _check_string(a + b)
+    # std::string + char and char + std::string append the character
+    if ca is str and cb is Char:
+        return _check_string(a + _char_text(b))
+    if ca is Char and cb is str:
+        return _check_string(_char_text(a) + b)
+    return _add_numbers(a, b)
+
+
+def _compare(py_op):
+    def op(a, b):
+        if (a.__class__ is str) is not (b.__class__ is str):
+            raise ExprError(f"Cannot compare {_type_name(a)} and {_type_name(b)}.")
+        return py_op(a, b)
+    return op
+
+
+_add_numbers = _arith("+", int.__add__, float.__add__)
+
+BINARY_OPS = {
+    "+": _add,
+    "-": _arith("-", int.__sub__, float.__sub__),
+    "*": _arith("*", int.__mul__, float.__mul__),
+    "/": _arith("/", _int_div, _float_div),
+    "%": _int_only("%", _int_mod),
+    "<<": _int_only("<<", lambda a, b: a << _shift_count(b)),
+    ">>": _int_only(">>", lambda a, b: a >> _shift_count(b)),
+    "&": _int_only("&", int.__and__),
+    "^": _int_only("^", int.__xor__),
+    "|": _int_only("|", int.__or__),
+    "<": _compare(operator.lt),
+    "<=": _compare(operator.le),
+    ">": _compare(operator.gt),
+    ">=": _compare(operator.ge),
+    "==": _compare(operator.eq),
+    "!=": _compare(operator.ne),
+}
+
+# Binding power of each binary operator (C++ precedence, higher binds tighter)
+_BINARY_POWER = {
+    "*": 10, "/": 10, "%": 10,
+    "+": 9, "-": 9,
+    "<<": 8, ">>": 8,
+    "<": 7, "<=": 7, ">": 7, ">=": 7,
+    "==": 6, "!=": 6,
+    "&": 5,
+    "^": 4,
+    "|": 3,
+    "&&": 2,
+    "||": 1,
+}
+_TERNARY_POWER = 0
+_ASSIGN_OPS = {"=", "+=", "-=", "*=", "/=", "%=", "<<=", ">>=", "&=", "^=", "|="}
+
+
+def truth(v):
+    """C++ truthiness of a condition value."""
+    if v.__class__ is str:
+        raise ExprError("A string cannot be used as a condition.")
+    return bool(v)
+
+
+def _negate(v):
+    if v.__class__ is str:
+        raise ExprError("Cannot negate a string.")
+    if v.__class__ is float:
+        return -v
+    return wrap_int(-v)
+
+
+def _plus(v):
+    if v.__class__ is str:
+        raise ExprError("Cannot apply '+' to a string.")
+    return v if v.__class__ is float else int(v)
+
+
+def _invert(v):
+    if v.__class__ in (str, float):
+        raise ExprError("'~' needs an int operand.")
+    return ~v
+
+
+UNARY_OPS = {
+    "-": _negate,
+    "+": _plus,
+    "!": lambda v: not truth(v),
+    "~": _invert,
+}
+
+
+# ---------------------------
+# conversions
+# ---------------------------
+def to_int(value):
+    """C++ conversion to int: floats truncate toward zero, bools become 0/1."""
+    if value.__class__ is str:
+        raise ExprError("Cannot convert a string to int.")
+    if value.__class__ is float and not math.isfinite(value):
+        raise ExprError("Cannot convert a non-finite float to int.")
+    return wrap_int(int(value))
+
+
+def to_char(value):
+    """C++ conversion to char: like int, then wrapped to a signed 8-bit value."""
+    n = to_int(value)
+    return Char(((n + 128) & 0xFF) - 128)
+
+
+def to_float(value):
+    if value.__class__ is str:
+        raise ExprError("Cannot convert a string to float.")
+    return float(value)
+
+
+def to_string(value):
+    if value.__class__ is not str:
+        raise ExprError("Cannot convert a number to string.")
+    return value
+
+
+CONVERSIONS = {
+    "int": to_int, "long": to_int, "short": to_int, "unsigned": to_int, "signed": to_int,
+    "char": to_char, "bool": truth,
+    "float": to_float, "double": to_float,
+    "string": to_string,
+}
+
+
+def convert(dtype, value):
+    """Convert value for storage in a variable declared as dtype."""
+    return CONVERSIONS.get(dtype, lambda v: v)(value)
+
+
+def _coerce_like(old, value):
+    """Assignment keeps the variable's type (int stays int, float stays float, ...)."""
+    if old.__class__ is float:
+        return to_float(value)
+    if old.__class__ is str:
+        return to_string(value)
+    if old.__class__ is Char:
+        return to_char(value)
+    return to_int(value)
+
+
+def _char_text(c):
+    return chr(c & 0xFF)
+
+
+_FORMATTERS = {
+    str: str,
+    int: str,
+    bool: lambda v: "1" if v else "0",
+    Char: _char_text,
+    float: lambda v: "%g" % v,
+}
+
+
+def format_value(value):
+    """Render a value the way cout prints it by default."""
+    return _FORMATTERS[value.__class__](value)
+
+
+# ---------------------------
+# literals
+# ---------------------------
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", "\\": "\\", '"': '"', "'": "'", "a": "\a", "b": "\b"}
+
+
+def string_literal(token: str) -> str:
+    """Value of a "..." (or '...') literal token, with escape sequences decoded."""
+    body = token[1:-1] if len(token) >= 2 and token[-1] == token[0] else token[1:]
+    if "\\" not in body:
+        return body
+    out = []
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\" and i + 1 < len(body):
+            out.append(_ESCAPES.get(body[i + 1], body[i + 1]))
+            i += 2
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def number_literal(token: str):
+    text = token.rstrip("fFuUlL")
+    if token[-1:] in "fF" and not any(c in text for c in ".eE"):
+        raise ExprError(f"Invalid number: {token}")
+    if any(c in text for c in ".eE"):
+        return float(text)
+    if len(text) > 1 and text[0] == "0":
+        try:
+            return int(text, 8)
+        except ValueError:
+            raise ExprError(f"Invalid octal number: {token}")
+    return int(text)
+
+
+# ---------------------------
+# parser: source -> tree of tuples
+# ---------------------------
+class _ExprParser:
+    """
+    Pratt parser over cpp_parser tokens. Nodes:
+        ("const", value) ("name", name) ("unary", op, node) ("binary", op, a, b)
+        ("and", a, b) ("or", a, b) ("cond", c, a, b) ("cast", dtype, node)
+        ("assign", op, name, node) ("step", delta, prefix, name)
+    """
+
+    def __init__(self, text):
+        self.toks = [(kind, tok) for kind, tok, _, _ in tokenize(text)]
+        self.pos = 0
+
+    def peek(self, offset=0):
+        i = self.pos + offset
+        if i < len(self.toks):
+            return self.toks[i][1]
+        return None
+
+    def next(self):
+        if self.pos >= len(self.toks):
+            raise ExprError("Unexpected end of expression.")
+        tok = self.toks[self.pos]
+        self.pos += 1
+        return tok
+
+    def expect(self, tok):
+        if self.peek() != tok:
+            raise ExprError(f"Expected '{tok}'.")
+        self.pos += 1
+
+    def parse(self):
+        if not self.toks:
+            raise ExprError("Empty expression.")
+        node = self.expression(_TERNARY_POWER)
+        if self.pos != len(self.toks):
+            raise ExprError(f"Unexpected '{self.peek()}'.")
+        return node
+
+    def expression(self, min_power):
+        left = self.unary()
+        while True:
+            op = self.peek()
+            if op in _ASSIGN_OPS:
+                # right-associative, lowest precedence: only at the top of a (sub)expression
+                if min_power > _TERNARY_POWER:
+                    break
+                if left[0] != "name":
+                    raise ExprError("Can only assign to a variable.")
+                self.pos += 1
+                left = ("assign", op, left[1], self.expression(_TERNARY_POWER))
+                continue
+            if op == "?":
+                if min_power > _TERNARY_POWER:
+                    break
+                self.pos += 1
+                then = self.expression(_TERNARY_POWER)
+                self.expect(":")
+                left = ("cond", left, then, self.expression(_TERNARY_POWER))
+                continue
+            power = _BINARY_POWER.get(op)
+            if power is None or power <= min_power:
+                break
+            self.pos += 1
+            right = self.expression(power)
+            if op == "&&":
+                left = ("and", left, right)
+            elif op == "||":
+                left = ("or", left, right)
+            else:
+                left = ("binary", op, left, right)
+        return left
+
+    def unary(self):
+        kind, tok = self.next()
+        if tok in UNARY_OPS and kind == "op":
+            return ("unary", tok, self.unary())
+        if tok in ("++", "--"):
+            target = self.unary()
+            if target[0] != "name":
+                raise ExprError(f"'{tok}' needs a variable.")
+            return ("step", 1 if tok == "++" else -1, True, target[1])
+        return self.postfix(self.primary(kind, tok))
+
+    def postfix(self, node):
+        while self.peek() in ("++", "--"):
+            if node[0] != "name":
+                raise ExprError(f"'{self.peek()}' needs a variable.")
+            node = ("step", 1 if self.next()[1] == "++" else -1, False, node[1])
+        return node
+
+    def primary(self, kind, tok):
+        if kind == "number":
+            return ("const", number_literal(tok))
+        if kind == "string":
+            return ("const", _check_string(string_literal(tok)))
+        if kind == "char":
+            text = string_literal(tok)
+            if len(text) != 1:
+                raise ExprError(f"Invalid character literal: {tok}")
+            return ("const", to_char(ord(text)))
+        if kind == "ident":
+            if tok in ("true", "false"):
+                return ("const", tok == "true")
+            if tok == "static_cast":
+                self.expect("<")
+                dtype = self.type_name()
+                self.expect(">")
+                self.expect("(")
+                node = self.expression(_TERNARY_POWER)
+                self.expect(")")
+                return ("cast", dtype, node)
+            if tok in TYPE_WORDS and self.peek() == "(":
+                # functional cast: int(x)
+                self.pos += 1
+                node = self.expression(_TERNARY_POWER)
+                self.expect(")")
+                return ("cast", tok, node)
+            return ("name", tok)
+        if tok == "(":
+            if self.peek() in TYPE_WORDS:
+                # C-style cast: (int) x
+                dtype = self.type_name()
+                self.expect(")")
+                return ("cast", dtype, self.unary())
+            node = self.expression(_TERNARY_POWER)
+            self.expect(")")
+            return node
+        raise ExprError(f"Unexpected '{tok}'.")
+
+    def type_name(self):
+        dtype = None
+        while self.peek() in TYPE_WORDS:
+            dtype = self.next()[1]
+        if dtype is None:
+            raise ExprError("Expected a type.")
+        return dtype
+
+
+# ---------------------------
+# compiler: tree -> closures
+# ---------------------------
+#
+# Closures index scope directly; a missing name surfaces as KeyError and is
+# turned into ExprError once, at the top (see _guard).
+
+def _fold(node):
+    """Replace constant subtrees by ("const", value); errors are left for run time."""
+    kind = node[0]
+    if kind in ("const", "name", "step"):
+        return node
+    if kind == "assign":
+        return node[:3] + (_fold(node[3]),)
+    folded = tuple(_fold(child) if isinstance(child, tuple) else child for child in node)
+    if all(child[0] == "const" for child in folded[1:] if isinstance(child, tuple)):
+        try:
+            return ("const", _compile_node(folded)(None))
+        except ExprError:
+            pass
+    return folded
+
+
+def _compile_node(node):
+    kind = node[0]
+
+    if kind == "const":
+        value = node[1]
+        return lambda scope: value
+
+    if kind == "name":
+        return operator.itemgetter(node[1])
+
+    if kind == "binary":
+        return _compile_binary(BINARY_OPS[node[1]], node[2], node[3])
+
+    if kind == "unary":
+        op = UNARY_OPS[node[1]]
+        operand = _compile_node(node[2])
+        return lambda scope: op(operand(scope))
+
+    if kind == "and":
+        left = _compile_node(node[1])
+        right = _compile_node(node[2])
+        return lambda scope: truth(left(scope)) and truth(right(scope))
+
+    if kind == "or":
+        left = _compile_node(node[1])
+        right = _compile_node(node[2])
+        return lambda scope: truth(left(scope)) or truth(right(scope))
+
+    if kind == "cond":
+        cond = _compile_node(node[1])
+        then = _compile_node(node[2])
+        other = _compile_node(node[3])
+        return lambda scope: then(scope) if truth(cond(scope)) else other(scope)
+
+    if kind == "cast":
+        conv = CONVERSIONS.get(node[1])
+        if conv is None:
+            raise ExprError(f"Cannot cast to {node[1]}.")
+        operand = _compile_node(node[2])
+        return lambda scope: conv(operand(scope))
+
+    if kind == "assign":
+        _, op, name, rhs_node = node
+        rhs = _compile_node(rhs_node)
+        combine = BINARY_OPS[op[:-1]] if op != "=" else None
+
+        def evaluate(scope):
+            old = scope[name]
+            value = rhs(scope)
+            if combine is not None:
+                value = combine(old, value)
+            value = scope[name] = _coerce_like(old, value)
+            return value
+        return evaluate
+
+    if kind == "step":
+        _, delta, prefix, name = node
+
+        def evaluate(scope):
+            old = scope[name]
+            if old.__class__ is int:
+                new = old + delta
+                if not INT_MIN <= new <= INT_MAX:
+                    new = wrap_int(new)
+            elif old.__class__ is str:
+                raise ExprError("Cannot increment a string.")
+            else:
+                new = _coerce_like(old, old + delta)
+            scope[name] = new
+            return new if prefix else old
+        return evaluate
+
+    raise ExprError(f"Unsupported expression node: {kind}")
+
+
+def _compile_binary(op, left_node, right_node):
+    """Binary operator, specialized for the common variable/literal operand shapes."""
+    lkind, rkind = left_node[0], right_node[0]
+    if lkind == "name" and rkind == "const":
+        name, value = left_node[1], right_node[1]
+        return lambda scope: op(scope[name], value)
+    if lkind == "name" and rkind == "name":
+        a, b = left_node[1], right_node[1]
+        return lambda scope: op(scope[a], scope[b])
+    if lkind == "const" and rkind == "name":
+        value, name = left_node[1], right_node[1]
+        return lambda scope: op(value, scope[name])
+    left = _compile_node(left_node)
+    right = _compile_node(right_node)
+    return lambda scope: op(left(scope), right(scope))
+
+
+def _compile_render(evaluate):
+    formatters = _FORMATTERS
+
+    def render(scope):
+        value = evaluate(scope)
+        return formatters[value.__class__](value)
+    return render
+
+
+def _guard(fn):
+    def evaluate(scope):
+        try:
+            return fn(scope)
+        except KeyError as e:
+            raise ExprError(f"Unknown identifier: {e.args[0]}") from None
+    return evaluate
+
+
+def _collect(node, names, assigns):
+    kind = node[0]
+    if kind == "name":
+        names.add(node[1])
+    elif kind == "assign":
+        names.add(node[2])
+        assigns.add(node[2])
+    elif kind == "step":
+        names.add(node[3])
+        assigns.add(node[3])
+    for child in node[1:]:
+        if isinstance(child, tuple):
+            _collect(child, names, assigns)
+
+
+class Expr:
+    """
+    A compiled expression.
+        evaluate(scope) -> value   (assignments / ++ / -- update scope in place)
+        render(scope) -> str       the value as cout prints it
+        names    identifiers the expression reads or writes
+        assigns  identifiers it writes
+    """
+
+    __slots__ = ("text", "evaluate", "render", "names", "assigns")
+
+    def __init__(self, text, evaluate, render, names, assigns):
+        self.text = text
+        self.evaluate = evaluate
+        self.render = render
+        self.names = names
+        self.assigns = assigns
+
+
+@source_cached(maxsize=1024)
+def compile_expr(text: str) -> Expr:
+    """
+    Parse and compile a C++ expression once; results are cached by source
+    text and shared. Raises ExprError for anything outside the supported
+    subset.
+    """
+    try:
+        node = _fold(_ExprParser(text).parse())
+        run = _compile_node(node)
+    except RecursionError:
+        raise ExprError("Expression is nested too deeply.") from None
+    names, assigns = set(), set()
+    _collect(node, names, assigns)
+    return Expr(text, _guard(run), _guard(_compile_render(run)), frozenset(names), frozenset(assigns))
+
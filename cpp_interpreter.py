@@ -0,0 +1,561 @@
+import threading
+import time
+from collections import deque
+
+from cpp_expr import ExprError, compile_expr, convert, string_literal, truth
+from cpp_parser import normalize_text, parse_after, parse_program, source_cached
+
+# -------------------
+# Statement interpreter
+# -------------------
+#
+# The parsed program is compiled once into tuples of statements, then run
+# with an explicit stack of frames (no Python recursion), in source order:
+# nested blocks, if/else chains, for/while loops, break/continue and
+# return from main all behave as in C++. One global step budget — every
+# statement and every loop-condition check costs one step — bounds the
+# cost of any submission, instead of a per-loop iteration cap.
+
+MAX_STEPS = 10_000
+MAX_OUTPUT_LENGTH = 100_000
+DEFAULT_TRACE_CAP = 1000
+
+# Value of a declared-but-uninitialized variable (C++ leaves it undefined)
+DEFAULT_VALUES = {"string": "", "float": 0.0, "double": 0.0, "bool": False}
+
+_MISSING = object()
+
+
+class ExecutionError(ValueError):
+    """The program failed while running (bad expression, stray break, ...)."""
+
+
+class StepLimitExceeded(ExecutionError):
+    """The program used up its step budget — almost always an infinite loop."""
+
+    def __init__(self, output):
+        super().__init__("Step limit exceeded.")
+        self.output = output
+
+
+class RunCancelled(Exception):
+    """The caller asked an in-flight run to stop (see OutputStream)."""
+
+
+class Trace:
+    """
+    Opt-in execution trace for the step-through visualizer.
+
+    One entry per executed step, delta-encoded: (step, line, set, unset,
+    printed) holds only the variables that changed, the ones that went out
+    of scope and the text printed since the previous entry. At most `cap`
+    entries are kept; when the oldest is dropped it is folded into `base`,
+    the variable state the kept entries start from, so memory stays
+    O(cap + variables) however long the program runs.
+    """
+
+    def __init__(self, cap=DEFAULT_TRACE_CAP):
+        self.cap = cap
+        self.entries = deque()
+        self.base = {}
+        self.base_output_length = 0
+        self.dropped = 0
+        self._last = {}
+        self._out_index = 0
+
+    def record(self, step, line, scope, out):
+        last = self._last
+        changed = {}
+        for name, value in scope.items():
+            old = last.get(name, _MISSING)
+            if old.__class__ is not value.__class__ or old != value:
+                changed[name] = value
+        removed = [name for name in last if name not in scope]
+        last.update(changed)
+        for name in removed:
+            del last[name]
+
+        printed = ""
+        if len(out) > self._out_index:
+            printed = "".join(out[self._out_index:])
+            self._out_index = len(out)
+
+        self.entries.append((step, line, changed, removed, printed))
+        if len(self.entries) > self.cap:
+            _, _, old_changed, old_removed, old_printed = self.entries.popleft()
+            self.base.update(old_changed)
+            for name in old_removed:
+                self.base.pop(name, None)
+            self.base_output_length += len(old_printed)
+            self.dropped += 1
+
+    def to_dict(self):
+        steps = []
+        for step, line, changed, removed, printed in self.entries:
+            entry = {"step": step, "line": line}
+            if changed:
+                entry["set"] = changed
+            if removed:
+                entry["unset"] = removed
+            if printed:
+                entry["out"] = printed
+            steps.append(entry)
+        return {
+            "dropped": self.dropped,
+            "base": {"variables": dict(self.base), "output_length": self.base_output_length},
+            "steps": steps,
+        }
+
+
+
+class OutputStream:
+    """
+    Trace-compatible observer for streaming a run as it happens.
+
+    Text printed since the last flush is passed to `write` at most every
+    `interval` seconds, and flush() sends whatever is left once the run is
+    over. Once `cancelled` (a threading.Event) is set the run stops at its
+    next step with RunCancelled.
+    """
+
+    def __init__(self, write, cancelled, interval=0.05):
+        self.write = write
+        self.cancelled = cancelled
+        self.interval = interval
+        self._out = None
+        self._sent = 0
+        self._next_flush = 0.0
+
+    def record(self, step, line, scope, out):
+        if self.cancelled.is_set():
+            raise RunCancelled()
+        self._out = out
+        if len(out) > self._sent and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        out = self._out
+        if out is not None and len(out) > self._sent:
+            self.write("".join(out[self._sent:]))
+            self._sent = len(out)
+        self._next_flush = time.monotonic() + self.interval
+
+
+# ---------------------------
+# cout
+# ---------------------------
+@source_cached(maxsize=1024, size=lambda parts: sum(map(len, parts)))
+def compile_cout(parts: tuple):
+    """
+    Compile the << parts of one cout statement once into render(scope) -> str.
+    scope: flat {name: value} of every visible variable
+
+    Literals are folded into a %-template up front; only identifiers and
+    expressions are evaluated against scope each time render is called.
+    """
+    template = []
+    literals = []
+    operands = []
+
+    for part in parts:
+        part = part.strip()
+
+        if not part:
+            continue
+
+        # Literal string
+        if part.startswith('"') and part.endswith('"'):
+            text = string_literal(part)
+        # endl
+        elif part in ("endl", "std::endl"):
+            text = "\n"
+        # Variable or expression e.g. a + b
+        else:
+            operands.append(_compile_cout_operand(part))
+            template.append("%s")
+            continue
+
+        literals.append(text)
+        template.append(text.replace("%", "%%"))
+
+    if not operands:
+        constant = "".join(literals)
+        return lambda scope: constant
+
+    template = "".join(template)
+
+    def render(scope):
+        return template % tuple([operand(scope) for operand in operands])
+
+    return render
+
+
+def _compile_cout_operand(part: str):
+    """render(scope) -> str for one operand; raises ValueError if it cannot be printed."""
+    try:
+        return compile_expr(part).render
+    except ExprError:
+        def invalid(scope):
+            raise ValueError(f"Invalid expression in cout: '{normalize_text(part)}'")
+        return invalid
+
+
+# ---------------------------
+# compiler: parse tree -> statement tuples
+# ---------------------------
+#   ("cout", render)                     ("expr", evaluate)
+#   ("decl", name, dtype, evaluate|None) ("block", body)
+#   ("if", condition, body, else_body)   ("while", condition, body)
+#   ("for", init|None, condition|None, update|None, body)
+#   ("break",) ("continue",) ("return",) ("error", message)
+# with the statement's source line appended as the last item.
+#
+# Anything that does not compile becomes an "error" statement, so it only
+# fails the run if it is actually reached.
+
+def _expression(text, what):
+    try:
+        return compile_expr(text).evaluate, None
+    except ExprError as e:
+        return None, ("error", f"Invalid {what} '{normalize_text(text)}': {e}")
+
+
+def _compile_body(nodes):
+    body = []
+    for node in nodes:
+        if node["kind"] == "block" and node["text"]:
+            # int a = 1, b = 2;  is a group of declarations, not a new scope
+            body.extend(_compile_statement(decl) + (decl["line"],) for decl in node["body"])
+            continue
+        stmt = _compile_statement(node)
+        if stmt is not None:
+            body.append(stmt + (node["line"],))
+    return tuple(body)
+
+
+def _compile_decl(node):
+    if node["rhs"] is None:
+        return ("decl", node["name"], node["dtype"], None)
+    evaluate, error = _expression(node["rhs"].strip(), "initializer")
+    return error or ("decl", node["name"], node["dtype"], evaluate)
+
+
+def _compile_statement(node):
+    kind = node["kind"]
+
+    if kind == "cout":
+        return ("cout", compile_cout(tuple(node["parts"])))
+
+    if kind == "expr":
+        text = node["text"].strip()
+        if not text or text.startswith("using "):
+            return None
+        evaluate, error = _expression(text, "statement")
+        return error or ("expr", evaluate)
+
+    if kind == "decl":
+        return _compile_decl(node)
+
+    if kind == "if":
+        condition, error = _expression(node["condition"], "condition")
+        if error:
+            return error
+        else_body = _compile_body(node["else_body"]) if node["else_body"] else ()
+        return ("if", condition, _compile_body(node["body"]), else_body)
+
+    if kind == "while":
+        condition, error = _expression(node["condition"], "condition")
+        return error or ("while", condition, _compile_body(node["body"]))
+
+    if kind == "for":
+        if len(node["header"]) != 3:
+            return ("error", f"Invalid for-loop header: {normalize_text(node['text'])}")
+        init_text, cond_text, update_text = (part.strip() for part in node["header"])
+        init = condition = update = None
+        if node["init_decl"] is not None:
+            init = _compile_decl(node["init_decl"])
+        elif init_text:
+            init = _compile_statement({"kind": "expr", "text": init_text})
+        if init is not None and init[0] == "error":
+            return init
+        if cond_text:
+            condition, error = _expression(cond_text, "condition")
+            if error:
+                return error
+        if update_text:
+            update, error = _expression(update_text, "update")
+            if error:
+                return error
+        return ("for", init, condition, update, _compile_body(node["body"]))
+
+    if kind == "block":
+        return ("block", _compile_body(node["body"]))
+
+    if kind == "function":
+        # only main() runs; other functions are never called
+        if node["name"] == "main":
+            return ("block", _compile_body(node["body"]))
+        return None
+
+    if kind in ("break", "continue", "return"):
+        return (kind,)
+
+    return None
+
+
+@source_cached(maxsize=256)
+def compile_program(code: str):
+    """Parse and compile C++ source into a tuple of statements (cached by source)."""
+    return _compile_body(parse_program(code)["body"])
+
+
+# ---------------------------
+# execution
+# ---------------------------
+# Each frame on the stack is a list [body, pc, declared, loop]:
+#   declared  (name, previous value) for variables declared in the block;
+#             restored when the block ends, so block-local variables go out
+#             of scope and outer variables they shadow come back
+#   loop      None for plain blocks; for a loop body [condition, update,
+#             declared, line] — the same frame is rewound for every
+#             iteration and the loop's own declarations (for (int i ...))
+#             live in it
+
+def _declare(scope, declared, decl):
+    name, dtype, evaluate = decl[1:4]
+    if evaluate is None:
+        value = DEFAULT_VALUES.get(dtype, 0)
+    else:
+        value = convert(dtype, evaluate(scope))
+    declared.append((name, scope.get(name, _MISSING)))
+    scope[name] = value
+
+
+def _restore(scope, declared):
+    for name, previous in reversed(declared):
+        if previous is _MISSING:
+            del scope[name]
+        else:
+            scope[name] = previous
+    declared.clear()
+
+
+def _unwind_to_loop(stack, scope, kind):
+    """Pop frames until the innermost loop body is on top (break / continue)."""
+    while stack and stack[-1][3] is None:
+        _restore(scope, stack.pop()[2])
+    if not stack:
+        raise ExecutionError(f"'{kind}' outside of a loop.")
+
+
+def _execute(program, scope, max_steps, out, trace, checkpoints=None, start_pc=0, steps=0):
+    """
+    Run `program` from top-level statement `start_pc`, with `scope`, `out`
+    and `steps` holding the state reached so far. When `checkpoints` is a
+    dict, the state before each top-level statement is saved in it by pc
+    as (scope copy, len(out), steps).
+    """
+    stack = [[program, start_pc, [], None]]
+    out_len = sum(map(len, out))
+
+    while stack:
+        frame = stack[-1]
+        body, pc = frame[0], frame[1]
+
+        # ---- end of a block: leave it, or start the loop's next iteration ----
+        if pc >= len(body):
+            if frame[2]:
+                _restore(scope, frame[2])
+            loop = frame[3]
+            if loop is None:
+                stack.pop()
+                continue
+            steps += 1
+            if steps > max_steps:
+                raise StepLimitExceeded("".join(out))
+            if loop[1] is not None:
+                loop[1](scope)
+            if loop[0] is None or truth(loop[0](scope)):
+                frame[1] = 0
+            else:
+                stack.pop()
+                _restore(scope, loop[2])
+            if trace is not None:
+                trace.record(steps, loop[3], scope, out)
+            continue
+
+        # ---- run the next statement ----
+        if checkpoints is not None and len(stack) == 1:
+            checkpoints[pc] = (dict(scope), len(out), steps)
+        steps += 1
+        if steps > max_steps:
+            raise StepLimitExceeded("".join(out))
+        frame[1] = pc + 1
+        stmt = body[pc]
+        kind = stmt[0]
+
+        if kind == "cout":
+            text = stmt[1](scope)
+            out_len += len(text)
+            if out_len > MAX_OUTPUT_LENGTH:
+                raise ExecutionError("Too much output.")
+            out.append(text)
+
+        elif kind == "expr":
+            stmt[1](scope)
+
+        elif kind == "decl":
+            _declare(scope, frame[2], stmt)
+
+        elif kind == "if":
+            if truth(stmt[1](scope)):
+                stack.append([stmt[2], 0, [], None])
+            elif stmt[3]:
+                stack.append([stmt[3], 0, [], None])
+
+        elif kind == "for" or kind == "while":
+            if kind == "for":
+                init, condition, update, loop_body = stmt[1:5]
+            else:
+                condition, loop_body = stmt[1:3]
+                init = update = None
+            loop = [condition, update, [], stmt[-1]]
+            if init is not None:
+                if init[0] == "decl":
+                    _declare(scope, loop[2], init)
+                else:
+                    init[1](scope)
+            if condition is None or truth(condition(scope)):
+                stack.append([loop_body, 0, [], loop])
+            else:
+                _restore(scope, loop[2])
+
+        elif kind == "block":
+            stack.append([stmt[1], 0, [], None])
+
+        elif kind == "continue":
+            _unwind_to_loop(stack, scope, kind)
+            stack[-1][1] = len(stack[-1][0])
+
+        elif kind == "break":
+            _unwind_to_loop(stack, scope, kind)
+            frame = stack.pop()
+            _restore(scope, frame[2])
+            _restore(scope, frame[3][2])
+
+        elif kind == "return":
+            return
+
+        elif kind == "error":
+            raise ExecutionError(stmt[1])
+
+        if trace is not None:
+            trace.record(steps, stmt[-1], scope, out)
+
+
+def run_program(code, scope=None, max_steps=MAX_STEPS, trace=None):
+    """
+    Run C++ source (or a compile_program result) and return everything it
+    prints, in execution order. `scope` ({name: value}) is updated in place,
+    and every step is recorded into `trace` (a Trace) when one is given.
+
+    Raises StepLimitExceeded when the step budget runs out and
+    ExecutionError for any other run-time failure.
+    """
+    program = compile_program(code) if isinstance(code, str) else code
+    if scope is None:
+        scope = {}
+    out = []
+    try:
+        _execute(program, scope, max_steps, out, trace)
+    except ExecutionError:
+        raise
+    except ValueError as e:
+        # ExprError and cout rendering errors
+        raise ExecutionError(str(e)) from None
+    return "".join(out)
+
+
+# ---------------------------
+# incremental re-evaluation
+# ---------------------------
+def _first_difference(a: str, b: str) -> int:
+    """Offset of the first character where a and b differ."""
+    n = min(len(a), len(b))
+    lo = 0
+    block = 256
+    while lo < n and a[lo:lo + block] == b[lo:lo + block]:
+        lo += block
+    while lo < n and a[lo] == b[lo]:
+        lo += 1
+    return lo
+
+
+class LiveProgram:
+    """
+    One student's program as it is being typed.
+
+    update(code) re-parses only the top-level statements from the first
+    changed line on, and run() resumes execution from the state saved
+    before the first statement that changed, so each keystroke costs
+    roughly the work of the edited part of the program. Resuming is exact:
+    unchanged statements always reach the same state.
+
+    Reuse is per top-level statement (a program wrapped in main() is one
+    statement). Callers must hold `lock` across update() and run().
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.code = None
+        self.program = None
+        self._compiled = []       # compiled statements, one tuple per top-level node
+        self._offsets = [0]       # root pc where each top-level node starts
+        self._checkpoints = {}    # root pc -> (scope, len(out), steps)
+        self._out = []
+
+    def update(self, code: str):
+        """Parse the new source, reusing unchanged leading statements; returns the program dict."""
+        keep = 0
+        if self.program is not None:
+            changed_at = _first_difference(self.code, code)
+            line_start = code.rfind("\n", 0, changed_at) + 1
+            spans = self.program["spans"]
+            while keep < len(spans) and spans[keep][1] <= line_start:
+                keep += 1
+            # The last kept statement may read past its end (if ... else), so redo it too
+            keep = max(0, keep - 1)
+
+        if keep:
+            self.program = parse_after(code, self.program, keep)
+        else:
+            self.program = parse_program(code)
+        self.code = code
+
+        self._compiled = self._compiled[:keep] + [
+            _compile_body([node]) for node in self.program["body"][keep:]
+        ]
+        self._offsets = self._offsets[:keep + 1]
+        for compiled in self._compiled[keep:]:
+            self._offsets.append(self._offsets[-1] + len(compiled))
+        reusable = self._offsets[keep]
+        self._checkpoints = {pc: state for pc, state in self._checkpoints.items() if pc <= reusable}
+        return self.program
+
+    def run(self, max_steps=MAX_STEPS, trace=None):
+        """Like run_program for the current source, resuming from the latest still-valid checkpoint."""
+        statements = tuple(stmt for compiled in self._compiled for stmt in compiled)
+        start_pc = max(self._checkpoints, default=0)
+        if start_pc in self._checkpoints:
+            saved_scope, out_count, steps = self._checkpoints[start_pc]
+            scope, out = dict(saved_scope), self._out[:out_count]
+        else:
+            scope, out, steps = {}, [], 0
+        self._out = out
+        try:
+            _execute(statements, scope, max_steps, out, trace, self._checkpoints, start_pc, steps)
+        except ExecutionError:
+            raise
+        except ValueError as e:
+            raise ExecutionError(str(e)) from None
+        return "".join(out)
@@ -0,0 +1,505 @@
+from bisect import bisect_right
+from functools import lru_cache, wraps
+
+from patterns import NEWLINE, TOKEN
+
+_SKIP = ("ws", "comment", "pp")
+
+# Words that can start a declaration (int x = 5;  unsigned long n;  const string s = "a";)
+TYPE_WORDS = {
+    "int", "float", "double", "string", "bool", "char",
+    "long", "short", "unsigned", "signed", "auto", "void",
+}
+
+# Deepest statement nesting accepted (blocks, if/for/while bodies); the
+# parser and compiler recurse once per level, so this also bounds their stack
+MAX_NESTING = 100
+
+_OPEN = {"(": ")", "[": "]", "{": "}"}
+_CLOSE = {")", "]", "}"}
+
+
+class ParseError(ValueError):
+    """Source the parser refuses to build a tree for (nesting deeper than MAX_NESTING)."""
+
+
+# Longest source (or expression) kept in the compile caches. Cached
+# entries hold roughly 50x their length in tokens, nodes and closures, so
+# bigger submissions are compiled every time instead of pinning memory.
+MAX_CACHED_SOURCE = 4_000
+
+
+def source_cached(maxsize, size=len):
+    """
+    lru_cache(maxsize) for a function of one source string (or other
+    argument measured by `size`) that bypasses the cache for arguments
+    longer than MAX_CACHED_SOURCE. Keeps cache_clear() / cache_info().
+    """
+    def decorate(fn):
+        cached = lru_cache(maxsize=maxsize)(fn)
+
+        @wraps(fn)
+        def wrapper(arg):
+            if size(arg) > MAX_CACHED_SOURCE:
+                return fn(arg)
+            return cached(arg)
+
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.cache_info = cached.cache_info
+        return wrapper
+    return decorate
+
+
+def tokenize(code: str, pos: int = 0):
+    """
+    Split C++ source (from offset `pos` on) into (kind, text, start, end)
+    tuples. Whitespace, comments and preprocessor lines are dropped.
+    """
+    tokens = []
+    for m in TOKEN.finditer(code, pos):
+        kind = m.lastgroup
+        if kind in _SKIP:
+            continue
+        tokens.append((kind, m.group(), m.start(), m.end()))
+    return tokens
+
+
+@source_cached(maxsize=256)
+def source_tokens(code: str):
+    """
+    Memoized tokenize(code) as a tuple. normalize_source (the result-cache
+    key), parse_program and the engine's pre-checks all need the tokens of
+    each new submission, so this way it is lexed once, not once per pass.
+    """
+    return tuple(tokenize(code))
+
+
+class _Parser:
+    """
+    Recursive-descent parser over the token list.
+
+    Every node is a dict with a "kind" key, the statement's source "text"
+    (without the trailing semicolon) and the 1-based "line" it starts on.
+    Expressions are kept as source text.
+    Anything it does not understand becomes an "expr" statement so the
+    simulators can decide what to do with it; the only error it raises is
+    ParseError, for statements nested more than MAX_NESTING deep.
+    """
+
+    def __init__(self, code, tokens):
+        self.code = code
+        self.toks = tokens
+        self.pos = 0
+        self.depth = 0
+        self._newlines = None
+
+    # ---------------------------
+    # token helpers
+    # ---------------------------
+    def peek(self, offset=0):
+        i = self.pos + offset
+        if i < len(self.toks):
+            return self.toks[i][1]
+        return None
+
+    def text(self, start, end):
+        """Source text covered by tokens[start:end]."""
+        if start >= end:
+            return ""
+        return self.code[self.toks[start][2]:self.toks[end - 1][3]]
+
+    def skip_group(self):
+        """Skip a bracketed group starting at the current opening token."""
+        depth = 0
+        while self.pos < len(self.toks):
+            t = self.toks[self.pos][1]
+            self.pos += 1
+            if t in _OPEN:
+                depth += 1
+            elif t in _CLOSE:
+                depth -= 1
+                if depth <= 0:
+                    return
+
+    def scan_until(self, stops):
+        """
+        Advance to the next depth-0 token in `stops` (not consumed).
+        A closing brace at depth 0 always stops, so a missing ';' cannot
+        swallow the rest of the enclosing block.
+        """
+        while self.pos < len(self.toks):
+            t = self.toks[self.pos][1]
+            if t in stops or t == "}":
+                return
+            if t in _OPEN:
+                self.skip_group()
+                continue
+            self.pos += 1
+
+    def paren_group(self):
+        """Consume '( ... )' and return the token range inside it."""
+        if self.peek() != "(":
+            return None
+        start = self.pos + 1
+        self.skip_group()
+        end = self.pos - 1 if self.toks[self.pos - 1][1] == ")" else self.pos
+        return start, end
+
+    def line(self, tok_index):
+        """1-based source line of tokens[tok_index]."""
+        if self._newlines is None:
+            self._newlines = [m.start() for m in NEWLINE.finditer(self.code)]
+        if tok_index >= len(self.toks):
+            return len(self._newlines) + 1
+        return bisect_right(self._newlines, self.toks[tok_index][2]) + 1
+
+    # ---------------------------
+    # statements
+    # ---------------------------
+    def parse_block(self):
+        """Parse statements up to (and consuming) the matching '}'."""
+        body = []
+        while self.pos < len(self.toks):
+            if self.peek() == "}":
+                self.pos += 1
+                return body
+            stmt = self.parse_statement()
+            if stmt is not None:
+                body.append(stmt)
+        return body
+
+    def parse_body(self):
+        """Loop/if body: a braced block or a single statement."""
+        if self.peek() == "{":
+            self.pos += 1
+            return self.parse_block()
+        if self.peek() in (None, "}"):
+            return []
+        stmt = self.parse_statement()
+        return [stmt] if stmt is not None else []
+
+    def parse_statement(self):
+        start = self.pos
+        self.depth += 1
+        if self.depth > MAX_NESTING:
+            raise ParseError(f"Blocks are nested more than {MAX_NESTING} levels deep.")
+        node = self._parse_statement()
+        self.depth -= 1
+        if node is not None and "line" not in node:
+            node["line"] = self.line(start)
+        return node
+
+    def _parse_statement(self):
+        t = self.peek()
+        start = self.pos
+
+        if t == ";":
+            self.pos += 1
+            return None
+        if t == "{":
+            self.pos += 1
+            return {"kind": "block", "text": "", "body": self.parse_block()}
+        if t == "for":
+            return self.parse_for()
+        if t == "while":
+            return self.parse_while()
+        if t == "if":
+            return self.parse_if()
+        if t in ("break", "continue"):
+            self.pos += 1
+            self.scan_until({";"})
+            self.eat(";")
+            return {"kind": t, "text": t}
+        if t == "return":
+            self.pos += 1
+            expr_start = self.pos
+            self.scan_until({";"})
+            node = {"kind": "return", "text": self.text(start, self.pos),
+                    "expr": self.text(expr_start, self.pos)}
+            self.eat(";")
+            return node
+        if t == "cout" or (t == "std" and self.peek(1) == "::" and self.peek(2) == "cout"):
+            return self.parse_cout()
+
+        decl = self.try_parse_decl()
+        if decl is not None:
+            return decl
+
+        # Generic expression statement: i = i + 1;  i++;  using namespace std;
+        self.scan_until({";"})
+        if self.pos == start:
+            # stray closing brace at top level
+            self.pos += 1
+            return None
+        node = {"kind": "expr", "text": self.text(start, self.pos)}
+        self.eat(";")
+        return node
+
+    def eat(self, tok):
+        if self.peek() == tok:
+            self.pos += 1
+            return True
+        return False
+
+    def parse_cout(self):
+        start = self.pos
+        if self.peek() == "std":
+            self.pos += 2
+        self.pos += 1  # cout
+        parts = []
+        part_start = None
+        while self.pos < len(self.toks):
+            t = self.peek()
+            if t in (";", "}"):
+                break
+            if t == "<<":
+                if part_start is not None:
+                    parts.append(self.text(part_start, self.pos))
+                part_start = None
+                self.pos += 1
+                continue
+            if part_start is None:
+                part_start = self.pos
+            if t in _OPEN:
+                self.skip_group()
+            else:
+                self.pos += 1
+        if part_start is not None:
+            parts.append(self.text(part_start, self.pos))
+        node = {"kind": "cout", "text": self.text(start, self.pos), "parts": parts}
+        self.eat(";")
+        return node
+
+    def type_prefix_len(self):
+        """Number of tokens forming a type at the cursor (0 if none)."""
+        i = 0
+        if self.peek(i) == "const":
+            i += 1
+        if self.peek(i) == "std" and self.peek(i + 1) == "::":
+            i += 2
+        n = 0
+        while self.peek(i + n) in TYPE_WORDS:
+            n += 1
+        if n == 0:
+            return 0
+        return i + n
+
+    def try_parse_decl(self):
+        start = self.pos
+        n = self.type_prefix_len()
+        if n == 0:
+            return None
+        name_idx = self.pos + n
+        if name_idx >= len(self.toks) or self.toks[name_idx][0] != "ident":
+            return None
+        dtype = self.toks[name_idx - 1][1]
+        after = self.peek(n + 1)
+
+        # int main() { ... } / void f(int a);
+        if after == "(":
+            self.pos = name_idx + 1
+            self.skip_group()
+            if self.peek() == "{":
+                self.pos += 1
+                body = self.parse_block()
+                return {"kind": "function", "text": self.text(start, name_idx + 1),
+                        "name": self.toks[name_idx][1], "body": body}
+            self.scan_until({";"})
+            node = {"kind": "expr", "text": self.text(start, self.pos)}
+            self.eat(";")
+            return node
+
+        if after not in ("=", ",", ";", "}", None):
+            return None
+
+        # one or more declarators: int a = 1, b;
+        self.pos = name_idx
+        decls = []
+        while self.pos < len(self.toks) and self.toks[self.pos][0] == "ident":
+            d_start = self.pos
+            name = self.toks[self.pos][1]
+            self.pos += 1
+            rhs = None
+            if self.eat("="):
+                rhs_start = self.pos
+                self.scan_until({",", ";"})
+                rhs = self.text(rhs_start, self.pos)
+            if self.peek() not in (",", ";"):
+                # unterminated (missing ';') → not a declaration
+                break
+            decls.append({
+                "kind": "decl",
+                "line": self.line(d_start),
+                "text": self.text(start if not decls else d_start, self.pos),
+                "dtype": dtype,
+                "name": name,
+                "rhs": rhs,
+            })
+            if not self.eat(","):
+                break
+        self.scan_until({";"})
+        if not decls:
+            return {"kind": "expr", "text": self.text(start, self.pos)}
+        self.eat(";")
+        if len(decls) == 1:
+            return decls[0]
+        return {"kind": "block", "text": self.text(start, self.pos), "body": decls}
+
+    def parse_header_decl(self, start, end):
+        """Declaration in a for-loop initializer: for (int i = 0; ...)."""
+        saved = self.pos
+        self.pos = start
+        n = self.type_prefix_len()
+        node = None
+        if (n and start + n + 1 < end and self.toks[start + n][0] == "ident"
+                and self.toks[start + n + 1][1] == "="):
+            node = {
+                "kind": "decl",
+                "line": self.line(start),
+                "text": self.text(start, end),
+                "dtype": self.toks[start + n - 1][1],
+                "name": self.toks[start + n][1],
+                "rhs": self.text(start + n + 2, end),
+            }
+        self.pos = saved
+        return node
+
+    def parse_for(self):
+        start = self.pos
+        self.pos += 1
+        node = {"kind": "for", "text": "", "header": [], "init_decl": None, "body": []}
+        group = self.paren_group()
+        if group is None:
+            self.scan_until({";"})
+            self.eat(";")
+            node["text"] = self.text(start, self.pos)
+            return node
+        g_start, g_end = group
+        node["text"] = self.text(start, self.pos)
+
+        # split header on depth-0 semicolons
+        bounds = []
+        depth = 0
+        part_start = g_start
+        for i in range(g_start, g_end):
+            t = self.toks[i][1]
+            if t in _OPEN:
+                depth += 1
+            elif t in _CLOSE:
+                depth -= 1
+            elif t == ";" and depth == 0:
+                bounds.append((part_start, i))
+                part_start = i + 1
+        bounds.append((part_start, g_end))
+        node["header"] = [self.text(a, b) for a, b in bounds]
+        if len(bounds) == 3:
+            node["init_decl"] = self.parse_header_decl(*bounds[0])
+
+        node["body"] = self.parse_body()
+        return node
+
+    def parse_while(self):
+        start = self.pos
+        self.pos += 1
+        node = {"kind": "while", "text": "", "condition": "", "body": []}
+        group = self.paren_group()
+        if group is not None:
+            node["condition"] = self.text(*group)
+        node["text"] = self.text(start, self.pos)
+        node["body"] = self.parse_body()
+        return node
+
+    def parse_if(self):
+        start = self.pos
+        self.pos += 1
+        node = {"kind": "if", "text": "", "condition": "", "body": [], "else_body": None}
+        group = self.paren_group()
+        if group is not None:
+            node["condition"] = self.text(*group)
+        node["text"] = self.text(start, self.pos)
+        node["body"] = self.parse_body()
+        if self.eat("else"):
+            node["else_body"] = self.parse_body()
+        return node
+
+    def parse_program(self):
+        """Top-level statements and the (start, end) source offsets of each."""
+        body = []
+        spans = []
+        while self.pos < len(self.toks):
+            start = self.pos
+            stmt = self.parse_statement()
+            if stmt is not None:
+                body.append(stmt)
+                spans.append((self.toks[start][2], self.toks[self.pos - 1][3]))
+        return body, spans
+
+
+_INDEXED = {"decl": "decls", "cout": "couts", "if": "ifs", "for": "fors", "while": "whiles"}
+
+
+def _index(nodes, index):
+    """Append every indexed node under `nodes` to index, in pre-order (source order)."""
+    for node in nodes:
+        key = _INDEXED.get(node["kind"])
+        if key is not None:
+            index[key].append(node)
+        if node["kind"] == "for" and node["init_decl"] is not None:
+            index["decls"].append(node["init_decl"])
+        if "body" in node:
+            _index(node["body"], index)
+        if node.get("else_body"):
+            _index(node["else_body"], index)
+
+
+def _program(body, spans):
+    program = {"body": body, "spans": spans, "decls": [], "couts": [], "ifs": [], "fors": [], "whiles": []}
+    _index(body, program)
+    return program
+
+
+@source_cached(maxsize=256)
+def parse_program(code: str):
+    """
+    Parse C++ source into a program dict:
+        {
+          "body":  [top-level statement nodes, in source order],
+          "spans": [(start, end) source offsets of each top-level statement],
+          "decls": [every declaration, pre-order, including for-loop initializers],
+          "couts": [every cout statement, pre-order],
+          "ifs" / "fors" / "whiles": [every such node, pre-order],
+        }
+
+    Results are cached by source text (up to MAX_CACHED_SOURCE characters),
+    so the returned structure is shared and must be treated as read-only.
+    """
+    return _program(*_Parser(code, source_tokens(code)).parse_program())
+
+
+def parse_after(code: str, prefix: dict, keep: int):
+    """
+    Program dict for `code` when its first `keep` top-level statements are
+    known to be unchanged from the already-parsed `prefix` program: only the
+    source after them is tokenized and parsed.
+    """
+    start = prefix["spans"][keep - 1][1] if keep else 0
+    body, spans = _Parser(code, tokenize(code, start)).parse_program()
+    return _program(prefix["body"][:keep] + body, prefix["spans"][:keep] + spans)
+
+
+def normalize_text(text: str) -> str:
+    """
+    normalize_source for a fragment of a submission, uncached. Messages that
+    quote student code use this, so that sources sharing a result-cache key
+    also share every message.
+    """
+    return " ".join(tok[1] for tok in tokenize(text))
+
+
+def normalize_source(code: str) -> str:
+    """
+    Canonical form of the source: comments and formatting removed, tokens
+    separated by single spaces. Submissions that differ only in whitespace
+    or comments normalize to the same string.
+    """
+    return " ".join(tok[1] for tok in source_tokens(code))
@@ -0,0 +1,311 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not available on Windows; sandbox workers then run without rlimits
+    resource = None
+
+
+class PoolSaturated(Exception):
+    """Raised when the queue-depth limit is reached; the caller should retry later."""
+
+
+class JobTimeout(Exception):
+    """Raised when a job misses its deadline."""
+
+
+class WorkerCrashed(Exception):
+    """A sandbox worker died mid-job (e.g. it hit its CPU or memory limit)."""
+
+
+def _apply_memory_limit(memory_bytes):
+    # Address-space budget on top of what the worker already maps after startup
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    resource.setrlimit(resource.RLIMIT_AS, (current + memory_bytes, current + memory_bytes))
+
+
+def _sandbox_worker(conn, cpu_seconds, memory_bytes):
+    """Worker process loop: receive (fn, args), run it, send back (ok, value)."""
+    if resource is not None and memory_bytes:
+        try:
+            _apply_memory_limit(memory_bytes)
+        except (OSError, ValueError):
+            pass
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU counts the whole process lifetime, so move the soft
+            # limit to "CPU used so far + this job's budget" before each job.
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, resource.RLIM_INFINITY))
+
+        fn, args = job
+        try:
+            result = (True, fn(*args))
+        except MemoryError:
+            # Hit RLIMIT_AS; the supervisor replaces this worker
+            result = (False, WorkerCrashed("memory limit exceeded"))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # unpicklable result or exception
+            conn.send((False, RuntimeError(repr(e))))
+
+
+class SandboxExecutor:
+    """
+    Pre-forked pool of resource-limited worker processes.
+
+    Each worker runs one job at a time under an RLIMIT_CPU budget of
+    `cpu_seconds` per job and an RLIMIT_AS budget of `memory_bytes`. A
+    supervisor thread per worker enforces the wall-clock `timeout`: a worker
+    that overruns, or dies on a limit, is killed and replaced, and its job
+    fails with JobTimeout / WorkerCrashed. Other jobs are unaffected. If a
+    replacement cannot be started, jobs that reach that supervisor fail with
+    WorkerCrashed while it retries with backoff.
+
+    Implements the submit()/shutdown() subset of concurrent.futures.Executor.
+    """
+
+    # Seconds between attempts to start a worker after one fails to start
+    SPAWN_BACKOFF = (0.1, 5.0)
+
+    def __init__(self, max_workers, timeout, cpu_seconds=None, memory_bytes=None):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._jobs = queue.Queue()
+        self._shutdown = False
+        self._supervisors = []
+        for n in range(max_workers):
+            thread = threading.Thread(target=self._supervise, name=f"sandbox-{n}", daemon=True)
+            thread.start()
+            self._supervisors.append(thread)
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_sandbox_worker,
+            args=(child_conn, self.cpu_seconds, self.memory_bytes),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    @staticmethod
+    def _kill(process, conn):
+        conn.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+    def _try_spawn(self):
+        """_spawn(), or (None, None) if the worker could not be started."""
+        try:
+            return self._spawn()
+        except Exception:
+            return None, None
+
+    def _supervise(self):
+        process, conn = self._try_spawn()
+        backoff, max_backoff = self.SPAWN_BACKOFF
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                if process is not None:
+                    try:
+                        conn.send(None)
+                    except OSError:
+                        pass
+                    self._kill(process, conn)
+                return
+
+            future, fn, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            if process is None:
+                process, conn = self._try_spawn()
+                if process is None:
+                    # Leave later jobs to supervisors that have a worker for a while
+                    future.set_exception(WorkerCrashed("could not start a sandbox worker"))
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, max_backoff)
+                    continue
+            backoff = self.SPAWN_BACKOFF[0]
+
+            try:
+                conn.send((fn, args))
+                if conn.poll(self.timeout):
+                    ok, value = conn.recv()
+                    if ok:
+                        future.set_result(value)
+                        continue
+                    if not isinstance(value, WorkerCrashed):
+                        future.set_exception(value)
+                        continue
+                    error = value
+                else:
+                    error = JobTimeout()
+            except (EOFError, OSError):
+                error = WorkerCrashed()
+
+            # overran its deadline, died or ran out of memory: replace the worker
+            future.set_exception(error)
+            self._kill(process, conn)
+            process, conn = self._try_spawn()
+
+    def submit(self, fn, *args):
+        if self._shutdown:
+            raise RuntimeError("cannot submit after shutdown")
+        future = Future()
+        self._jobs.put((future, fn, args))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+        for _ in self._supervisors:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._supervisors:
+                thread.join()
+
+
+class EnginePool:
+    """
+    Runs CPU-bound engine work off the event loop.
+
+    mode:
+        "thread"  - ThreadPoolExecutor (default, cheapest to start)
+        "process" - ProcessPoolExecutor (true parallelism across cores)
+        "sandbox" - SandboxExecutor: pre-forked processes with CPU/memory
+                    rlimits, killed and replaced when a job overruns
+        "inline"  - run on the calling thread (old behaviour, useful for debugging)
+
+    At most `max_queue` jobs may be running or waiting at once; beyond that
+    run() raises PoolSaturated instead of queueing. A job that takes longer
+    than `timeout` seconds raises JobTimeout. Thread and process workers
+    cannot be interrupted, so their slot stays counted until the job actually
+    finishes; sandbox workers are killed at the deadline.
+    """
+
+    MODES = ("thread", "process", "sandbox", "inline")
+
+    def __init__(self, mode="thread", max_workers=None, max_queue=64, timeout=10.0,
+                 cpu_seconds=None, memory_bytes=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown engine pool mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            elif self.mode == "sandbox":
+                self._executor = SandboxExecutor(
+                    self.max_workers, self.timeout, self.cpu_seconds, self.memory_bytes
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="engine"
+                )
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def queue_depth(self):
+        return self.pending
+
+    def start(self):
+        """Create the executor now (pre-forks sandbox workers) instead of on first use."""
+        if self.mode != "inline":
+            self._get_executor()
+
+    def submit(self, fn, *args):
+        """
+        Reserve a slot and submit fn(*args) to the executor.
+        Returns a concurrent.futures.Future; raises PoolSaturated when full.
+        """
+        with self._lock:
+            if self.pending >= self.max_queue:
+                raise PoolSaturated()
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool and await its result within the deadline."""
+        if self.mode == "inline":
+            return fn(*args)
+
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise JobTimeout()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def pool_from_env():
+    """
+    Build an EnginePool from ENGINE_POOL_MODE / ENGINE_WORKERS / ENGINE_QUEUE_LIMIT /
+    ENGINE_JOB_TIMEOUT, plus SANDBOX_CPU_SECONDS / SANDBOX_MEMORY_MB for sandbox mode.
+    """
+    workers = os.environ.get("ENGINE_WORKERS")
+    timeout = float(os.environ.get("ENGINE_JOB_TIMEOUT", "10"))
+    return EnginePool(
+        mode=os.environ.get("ENGINE_POOL_MODE", "thread"),
+        max_workers=int(workers) if workers else None,
+        max_queue=int(os.environ.get("ENGINE_QUEUE_LIMIT", "64")),
+        timeout=timeout,
+        cpu_seconds=int(os.environ.get("SANDBOX_CPU_SECONDS", max(1, int(timeout)))),
+        memory_bytes=int(os.environ.get("SANDBOX_MEMORY_MB", "256")) * 1024 * 1024,
+    )
@@ -1,4 +1,11 @@
 # lessons_data.py
+#
+# Each lesson is validated purely from this data (see lesson_validators.py):
+#   "tasks"           reference values / loops the checks compare against
+#   "checks"          ordered list of checks; the first failure is the feedback
+#   "output_source"   "raw_output" (every cout) or "output" (simulated), default "output"
+#   "sample_output"   shown to the student when their code cannot be run
+#   "success_message" feedback when every check passes
 LESSONS = {
     "lesson1": {
         "title": "Intro to Integers",
@@ -10,6 +17,20 @@ LESSONS = {
                 "value": 16,
                 "must_print": True
             }
+        ],
+        "sample_output": "16",
+        "output_source": "raw_output",
+        "success_message": "Well done!",
+        "checks": [
+            {
+                "check": "variables",
+                "messages": {
+                    "missing": "You must declare a variable named '{var}'.",
+                    "wrong_type": "'{var}' must be {article} {type} (e.g. {example}).",
+                    "wrong_value": "Set '{var}' equal to {value} (e.g. {example})."
+                }
+            },
+            {"check": "printed_value"}
         ]
     },
     "lesson2": {
@@ -22,6 +43,20 @@ LESSONS = {
                 "value": "Alex",
                 "must_print": True
             }
+        ],
+        "sample_output": "Alex",
+        "output_source": "raw_output",
+        "success_message": "Well done!",
+        "checks": [
+            {
+                "check": "variables",
+                "messages": {
+                    "missing": "You must declare a variable named '{var}'.",
+                    "wrong_type": "'{var}' must be {article} {type} (e.g. {example}).",
+                    "wrong_value": "Set '{var}' equal to {value} (e.g. {example})."
+                }
+            },
+            {"check": "printed_value"}
         ]
     },
     "lesson3": {
@@ -37,6 +72,12 @@ LESSONS = {
                 "must_print": True,
                 "dynamic": True
             }
+        ],
+        "sample_output": "Large",
+        "success_message": "Correct if/else logic!",
+        "checks": [
+            {"check": "variables"},
+            {"check": "condition_output"}
         ]
     },
 
@@ -56,6 +97,11 @@ LESSONS = {
                 "must_print": True,
                 "dynamic": True
             }
+        ],
+        "sample_output": "Iteration 0Iteration 1Iteration 2",
+        "success_message": "Loop logic is correct!",
+        "checks": [
+            {"check": "loop_output"}
         ]
     },
 
@@ -85,6 +131,26 @@ LESSONS = {
                 "must_print": True,
                 "dynamic": True
             }
+        ],
+        "sample_output": "0,00,1,01,0,11,1,1",
+        "success_message": "Great job! Your conditional and loop logic are correct.",
+        "checks": [
+            {
+                "check": "variables",
+                "messages": {"wrong_type": "'{var}' must be {article} {type}."}
+            },
+            {
+                "check": "condition_output",
+                "condition": "limit % 2 == 1",
+                "true_output": "Odd",
+                "false_output": "Even",
+                "messages": {"mismatch": "Your code must print '{expected}' based on limit % 2."}
+            },
+            {
+                "check": "loop_lines",
+                "pattern": "loop:\\s*\\d+",
+                "line_template": "loop: {value}"
+            }
         ]
     }
 }
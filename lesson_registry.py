@@ -0,0 +1,87 @@
+import functools
+import importlib
+
+import lesson_data
+
+# Reference loops in lesson data must finish within this many iterations
+MAX_TASK_ITERATIONS = 1000
+
+_cached_functions = []
+
+
+def lesson_cached(fn):
+    """
+    Memoize fn(*args) until the lesson data is reloaded.
+    Cached values are shared between requests and must not be mutated.
+    """
+    cached = functools.lru_cache(maxsize=1024)(fn)
+    _cached_functions.append(cached)
+    return cached
+
+
+def invalidate():
+    """Drop every precomputed value (call after changing lesson_data.LESSONS)."""
+    for cached in _cached_functions:
+        cached.cache_clear()
+
+
+def reload_lessons():
+    """Re-import lesson_data from disk and drop everything derived from it."""
+    importlib.reload(lesson_data)
+    invalidate()
+
+
+def get_lessons():
+    return lesson_data.LESSONS
+
+
+def get_task(lesson_id: str, task_index: int = 0):
+    return lesson_data.LESSONS[lesson_id]["tasks"][task_index]
+
+
+def run_task_loop(task):
+    """
+    Run a task's reference loop (init_values / condition / update) and
+    return a tuple with a snapshot of the scope at the start of each iteration.
+    """
+    scope = dict(task["init_values"])
+    condition = compile(task["condition"], "<condition>", "eval")
+
+    updates = task["update"]
+    if not isinstance(updates, list):
+        updates = [updates]
+    updates = [compile(upd, "<update>", "exec") for upd in updates]
+
+    snapshots = []
+    while eval(condition, {}, scope):
+        if len(snapshots) >= MAX_TASK_ITERATIONS:
+            raise ValueError("Lesson loop does not terminate.")
+        snapshots.append(dict(scope))
+        for upd in updates:
+            exec(upd, {}, scope)
+
+    return tuple(snapshots)
+
+
+@lesson_cached
+def task_iterations(lesson_id: str, task_index: int = 0):
+    """Cached run_task_loop for a lesson task."""
+    return run_task_loop(get_task(lesson_id, task_index))
+
+
+@lesson_cached
+def expected_loop_output(lesson_id: str, task_index: int = 0):
+    """cout_template followed by i, once per iteration (e.g. "iteration 0iteration 1...")."""
+    task = get_task(lesson_id, task_index)
+    return "".join(
+        f"{task['cout_template']}{scope['i']}"
+        for scope in task_iterations(lesson_id, task_index)
+    )
+
+
+def warm_up():
+    """Precompute reference loop results for every lesson that has one."""
+    for lesson_id, lesson in get_lessons().items():
+        for task_index, task in enumerate(lesson["tasks"]):
+            if "condition" in task and "update" in task:
+                task_iterations(lesson_id, task_index)
@@ -1,202 +1,260 @@
-from Cpp_engine import evaluate_output, extract_vars, check_prints
-from lesson_data import LESSONS
-import re 
+import functools
 
+import lesson_registry
+import patterns
 
 
-def lesson1_validator(code: str, result: dict):
+# -------------------
+# Data-driven lesson checks
+# -------------------
+#
+# Every lesson in lesson_data.LESSONS lists its "checks". Each check spec is
+# compiled once into a closure check(result) -> feedback string (failure) or
+# None (pass); a lesson's compiled checks form its plan. Adding a lesson only
+# needs data; adding a new *kind* of check means adding a builder below.
+
+DEFAULT_MESSAGES = {
+    "variables": {
+        "missing": "You must declare variable '{var}'.",
+        "wrong_type": "'{var}' must be type {type}.",
+        "wrong_value": "Set '{var}' equal to {value}.",
+    },
+    "printed_value": {
+        "not_printed": "Make sure to print '{var}' using cout.",
+    },
+    "condition_output": {
+        "invalid": "Invalid if-statement condition.",
+        "mismatch": "Expected printed output: '{expected}'.",
+    },
+    "loop_output": {
+        "infinite": "Infinite loop detected.",
+        "empty": "You must print loop output using cout.",
+        "mismatch": "Expected: '{expected}' but got '{actual}'.",
+    },
+    "loop_lines": {
+        "empty": "You must print loop output using cout.",
+        "mismatch": "Loop output does not match.\nExpected: {expected}\nGot: {actual}",
+    },
+}
+
+
+def _messages(spec):
+    messages = dict(DEFAULT_MESSAGES.get(spec["check"], {}))
+    messages.update(spec.get("messages", {}))
+    return messages
+
+
+def _task_vars(task):
+    """[(name, type), ...] for either a single-var ("var"/"type") or multi-var ("vars"/"types") task."""
+    if "var" in task:
+        return [(task["var"], task["type"])]
+    return list(zip(task["vars"], task["types"]))
+
+
+def _literal(dtype, value):
+    if dtype == "string":
+        return f'"{value}"'
+    return str(value)
+
+
+def _build_variables(spec, task, ctx):
+    """Each variable is declared with the right type (and value, for tasks with a single "value")."""
+    messages = _messages(spec)
+    expected_value = str(task["value"]) if "value" in task else None
+
+    # (name, type, expected value, missing msg, type msg, value msg) — all rendered up front
+    rules = []
+    for var, dtype in _task_vars(task):
+        fields = {
+            "var": var,
+            "type": dtype,
+            "value": expected_value,
+            "article": "an" if dtype[0] in "aeiou" else "a",
+            "example": f"{dtype} {var} = {_literal(dtype, task.get('value'))};",
+        }
+        rules.append((
+            var,
+            dtype,
+            expected_value,
+            messages["missing"].format(**fields),
+            messages["wrong_type"].format(**fields),
+            messages["wrong_value"].format(**fields),
+        ))
+
+    def check(result):
+        vars_dict = result["variables"]
+        for var, dtype, value, missing, wrong_type, wrong_value in rules:
+            if var not in vars_dict:
+                return missing
+            if vars_dict[var]["type"] != dtype:
+                return wrong_type
+            if value is not None and str(vars_dict[var]["value"]) != value:
+                return wrong_value
+        return None
+
+    return check
+
+
+def _build_printed_value(spec, task, ctx):
+    """The task's value appears in the printed output."""
+    expected_value = str(task["value"])
+    not_printed = _messages(spec)["not_printed"].format(var=task["var"])
+    source = ctx["output_source"]
+
+    def check(result):
+        if expected_value not in result[source].strip():
+            return not_printed
+        return None
+
+    return check
+
+
+def _build_condition_output(spec, task, ctx):
     """
-    Returns: (success: bool, feedback: str)
+    Evaluate a condition over the student's variables and require the
+    matching branch output (true_output / false_output) to be printed.
     """
-
-    printed_output = result["raw_output"].strip()
-    vars_dict = result["variables"]
-
-    # Your lesson 1 expects:
-    # int age = 16; cout << age;
-    expected_var = "age"
-    expected_type = "int"
-    expected_value = "16"
-
-    # 1. Variable existence
-    if expected_var not in vars_dict:
-        return False, "You must declare a variable named 'age'."
-
-    # 2. Type check
-    if vars_dict[expected_var]["type"] != expected_type:
-        return False, "'age' must be an int (e.g. int age = 16;)."
-
-    # 3. Value check
-    if str(vars_dict[expected_var]["value"]) != expected_value:
-        return False, f"Set 'age' equal to {expected_value} (e.g. int age = 16;)."
-
-    # 4. Print check
-    if expected_value not in printed_output:
-        return False, "Make sure to print 'age' using cout."
-
-    return True, "Well done!"
- 
-
-def lesson2_validator(code: str, result: dict):
-    printed_output = result["raw_output"].strip()
-    vars_dict = result["variables"]
-
-    expected_var = "name"
-    expected_type = "string"
-    expected_value = "Alex"
-
-    if expected_var not in vars_dict:
-        return False, "You must declare a variable named 'name'."
-
-    if vars_dict[expected_var]["type"] != expected_type:
-        return False, "'name' must be a string (e.g. string name = \"Alex\";)."
-
-    if str(vars_dict[expected_var]["value"]) != expected_value:
-        return False, f"Set '{expected_var}' equal to {expected_value} (e.g. string name = \"Alex\";)."
-
-    if expected_value not in printed_output:
-        return False, "Make sure to print 'name' using cout."
-
-    return True, "Well done!"
-
-
-# ===== Lesson 3 Validator =====
-def lesson3_validator(code: str, result: dict):
-    printed_output = result["output"].strip()
-    vars_dict = result["variables"]
-
-    task = LESSONS["lesson3"]["tasks"][0]
-
-    var = task["vars"][0]
-    expected_type = task["types"][0]
-    init_value = task["init_values"][var]
-
-    # Must declare variable
-    if var not in vars_dict:
-        return False, f"You must declare variable '{var}'."
-
-    # Must match type
-    if vars_dict[var]["type"] != expected_type:
-        return False, f"'{var}' must be type {expected_type}."
-
-    # Condition evaluation
-    scope = {var: vars_dict[var]["value"]}
-
+    messages = _messages(spec)
+    condition = compile(spec.get("condition", task.get("condition")), "<condition>", "eval")
+    names = condition.co_names
+    outputs = {
+        True: spec.get("true_output", task.get("true_output")),
+        False: spec.get("false_output", task.get("false_output")),
+    }
+    mismatch = {
+        branch: messages["mismatch"].format(expected=text)
+        for branch, text in outputs.items()
+    }
+    source = ctx["output_source"]
+
+    @functools.lru_cache(maxsize=1024)
+    def branch_for(values):
+        return bool(eval(condition, {}, dict(zip(names, values))))
+
+    def check(result):
+        vars_dict = result["variables"]
+        try:
+            branch = branch_for(tuple(vars_dict[name]["value"] for name in names))
+        except Exception:
+            return messages["invalid"]
+        if outputs[branch] not in result[source].strip():
+            return mismatch[branch]
+        return None
+
+    return check
+
+
+def _build_loop_output(spec, task, ctx):
+    """Printed output (spaces and newlines ignored) equals the task's reference loop output."""
+    messages = _messages(spec)
+    source = ctx["output_source"]
     try:
-        cond_result = eval(task["condition"], {}, scope)
-    except:
-        return False, "Invalid if-statement condition."
-
-    expected_output = task["true_output"] if cond_result else task["false_output"]
-
-    if expected_output not in printed_output:
-        return False, f"Expected printed output: '{expected_output}'."
-
-    return True, "Correct if/else logic!"
-
-
-# -------------------
-# LESSON 4 — LOOPS
-# -------------------
-def lesson4_validator(code: str, result: dict):
-    from lesson_data import LESSONS
-    task = LESSONS["lesson4"]["tasks"][0]
-
-    vars_dict = result["variables"]
-
-    # ---- 1. Extract student cout output directly ----
-    # IMPORTANT: use raw cout output, not simulation
-    student_output_lines = result["output"].split("\n")
-    student_output_clean = "".join(student_output_lines).replace(" ", "").strip()
-
-    # ---- 2. Simulate the expected loop based on init + condition + update ----
-    scope = dict(task["init_values"])
-    expected_output = ""
-
-    iterations = 0
-    while eval(task["condition"], {}, scope):
-        iterations += 1
-        if iterations > 1000:
-            return False, "Infinite loop detected."
-
-        expected_output += f"{task['cout_template']}{scope['i']}"
-
-        # apply update
-        updates = task["update"]
-        if not isinstance(updates, list):
-            updates = [updates]
-
-        for upd in updates:
-            exec(upd, {}, scope)
-
+        expected_output = lesson_registry.expected_loop_output(ctx["lesson_id"], ctx["task_index"])
+    except ValueError:
+        infinite = messages["infinite"]
+        return lambda result: infinite
     expected_clean = expected_output.replace(" ", "")
 
-    # ---- 3. Compare actual to expected ----
-    if student_output_clean == "":
-        return False, "You must print loop output using cout."
-
-    if student_output_clean != expected_clean:
-        return False, (
-            f"Expected: '{expected_output}' but got '{result['output']}'."
-        )
-
-    return True, "Loop logic is correct!"
-
-
-
-# -------------------
-# LESSON 5 — Combined logic
-# -------------------
-
-def lesson5_validator(code: str, result: dict):
-    output_raw = result["output"]
-    vars_dict = result["variables"]
-
-    # ---- 1. Required variables ---------------------
-    required_vars = ["limit", "i", "value"]
-    for v in required_vars:
-        if v not in vars_dict:
-            return False, f"You must declare variable '{v}'."
-
-        if vars_dict[v]["type"] != "int":
-            return False, f"'{v}' must be an int."
-
-    # ---- 2. Conditional test -----------------------
-    limit_value = vars_dict["limit"]["value"]
-    expected_cond_output = "Odd" if (limit_value % 2 == 1) else "Even"
-
-    if expected_cond_output not in output_raw:
-        return False, f"Your code must print '{expected_cond_output}' based on limit % 2."
-
-    # ---- 3. Generate expected dynamic loop output ---
-    task = LESSONS["lesson5"]["tasks"][0]
-    expected_loop_output = []
-    scope = dict(task["init_values"])
+    def check(result):
+        output = result[source]
+        student_clean = output.replace("\n", "").replace(" ", "").strip()
+        if student_clean == "":
+            return messages["empty"]
+        if student_clean != expected_clean:
+            return messages["mismatch"].format(expected=expected_output, actual=output)
+        return None
 
-    while eval(task["condition"], {}, scope):
-        expected_loop_output.append(f"loop: {scope['value']}")
-        updates = task["update"]
-        if not isinstance(updates, list):
-            updates = [updates]
-        for upd in updates:
-            exec(upd, {}, scope)
+    return check
 
-    # ---- 4. Extract loop outputs ANYWHERE in output ----
-    loop_lines = re.findall(r'loop:\s*\d+', output_raw)
 
-    if not loop_lines:
-        return False, "You must print loop output using cout."
+def _build_loop_lines(spec, task, ctx):
+    """
+    Every match of `pattern` in the output, in order, equals the reference
+    loop rendered through `line_template` once per iteration.
+    """
+    messages = _messages(spec)
+    source = ctx["output_source"]
+    pattern = patterns.compiled(spec["pattern"])
+    template = spec["line_template"]
+    expected = [
+        template.format(**scope)
+        for scope in lesson_registry.task_iterations(ctx["lesson_id"], ctx["task_index"])
+    ]
+
+    def check(result):
+        lines = pattern.findall(result[source])
+        if not lines:
+            return messages["empty"]
+        if lines != expected:
+            return messages["mismatch"].format(expected=expected, actual=lines)
+        return None
+
+    return check
+
+
+CHECK_BUILDERS = {
+    "variables": _build_variables,
+    "printed_value": _build_printed_value,
+    "condition_output": _build_condition_output,
+    "loop_output": _build_loop_output,
+    "loop_lines": _build_loop_lines,
+}
+
+
+@lesson_registry.lesson_cached
+def get_plan(lesson_id: str):
+    """
+    Compile a lesson's checks into a plan:
+        {"checks": (check, ...), "output_source": ..., "sample_output": ..., "success_message": ...}
+    Raises KeyError for unknown lessons and ValueError for unknown check types.
+    """
+    lesson = lesson_registry.get_lessons()[lesson_id]
+    output_source = lesson.get("output_source", "output")
 
-    # ---- 5. Compare exact sequence -----------------------
-    if loop_lines != expected_loop_output:
-        return False, (
-            "Loop output does not match.\n"
-            f"Expected: {expected_loop_output}\n"
-            f"Got: {loop_lines}"
-        )
+    checks = []
+    for spec in lesson.get("checks", []):
+        builder = CHECK_BUILDERS.get(spec["check"])
+        if builder is None:
+            raise ValueError(f"Unknown check type in {lesson_id}: {spec['check']}")
+        task_index = spec.get("task", 0)
+        ctx = {"lesson_id": lesson_id, "task_index": task_index, "output_source": output_source}
+        checks.append(builder(spec, lesson["tasks"][task_index], ctx))
 
-    return True, "Great job! Your conditional and loop logic are correct."
+    return {
+        "checks": tuple(checks),
+        "output_source": output_source,
+        "sample_output": lesson.get("sample_output", ""),
+        "success_message": lesson.get("success_message", "Well done!"),
+    }
 
 
+def is_lesson(lesson_id: str) -> bool:
+    return lesson_id in lesson_registry.get_lessons()
 
 
+def validate(lesson_id: str, result: dict):
+    """
+    Run a lesson's checks against an evaluate_output result.
+    Returns: (success: bool, feedback: str)
+    """
+    plan = get_plan(lesson_id)
+    for check in plan["checks"]:
+        feedback = check(result)
+        if feedback is not None:
+            return False, feedback
+    return True, plan["success_message"]
+
+
+def make_validator(lesson_id: str):
+    """(code, result) -> (success, feedback) validator for one lesson."""
+    def validator(code: str, result: dict):
+        return validate(lesson_id, result)
+    validator.__name__ = f"{lesson_id}_validator"
+    return validator
+
+
+lesson1_validator = make_validator("lesson1")
+lesson2_validator = make_validator("lesson2")
+lesson3_validator = make_validator("lesson3")
+lesson4_validator = make_validator("lesson4")
+lesson5_validator = make_validator("lesson5")
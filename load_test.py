@@ -0,0 +1,285 @@
+# load_test.py
+#
+# Load generator for the /validate service. Runs offline on one machine:
+#
+#   python load_test.py                                 main.app in-process, default settings
+#   python load_test.py --server uvicorn --workers 4    a local uvicorn with 4 worker processes
+#   python load_test.py --url http://127.0.0.1:8000     a server that is already running
+#
+# Each concurrency level (--concurrency 1,2,4,...) keeps that many clients
+# sending back-to-back requests for --duration seconds, drawn from the
+# submission corpus (bench_corpus.CORPUS or --corpus FILE) with the lesson
+# weights from --mix. --unique sets the fraction of submissions made distinct
+# so they miss the result cache. Engine settings (--pool-mode, --engine-workers,
+# --queue-limit, --cache-size) are passed to the app as its usual environment
+# variables, so worker models and cache settings can be compared run to run.
+#
+# Reports throughput, latency percentiles and error rate per level, and the
+# saturation point: the first level where throughput stops growing by at
+# least --min-gain, errors exceed --max-error-rate or p99 exceeds --slo-ms.
+# In-process runs share one event loop and CPU with the load generator, so
+# use --server uvicorn when comparing absolute capacity.
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+try:
+    import httpx
+except ImportError:  # only needed here, not by the service
+    httpx = None
+
+import bench_corpus
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_mix(text, lesson_ids):
+    """"lesson1=3,lesson4=1" -> {lesson_id: weight}; empty means every lesson equally."""
+    if not text:
+        return {lesson_id: 1.0 for lesson_id in lesson_ids}
+    mix = {}
+    for part in text.split(","):
+        lesson_id, _, weight = part.partition("=")
+        lesson_id = lesson_id.strip()
+        if lesson_id not in lesson_ids:
+            raise ValueError(f"Lesson {lesson_id!r} is not in the corpus")
+        mix[lesson_id] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """Draws (lesson_id, code) pairs from a corpus with the given lesson weights."""
+
+    def __init__(self, corpus, mix, unique=0.0, seed=0):
+        self.lesson_ids = list(mix)
+        self.weights = [mix[lesson_id] for lesson_id in self.lesson_ids]
+        self.submissions = {lesson_id: list(corpus[lesson_id].values()) for lesson_id in self.lesson_ids}
+        self.unique = unique
+        self.rng = random.Random(seed)
+        self._serial = 0
+
+    def next(self):
+        lesson_id = self.rng.choices(self.lesson_ids, self.weights)[0]
+        code = self.rng.choice(self.submissions[lesson_id])
+        if self.unique and ";" in code and self.rng.random() < self.unique:
+            # A real statement, so whitespace/comment normalization can't fold it away
+            self._serial += 1
+            code = f"{code}\nint load_variant = {self._serial};"
+        return lesson_id, code
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_level(client, workload, concurrency, duration):
+    """Closed loop: `concurrency` clients send requests back to back for `duration` seconds."""
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            lesson_id, code = workload.next()
+            start = time.perf_counter()
+            try:
+                response = await client.post("/validate", json={"lesson_id": lesson_id, "code": code})
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = len(latencies)
+    errors = total - statuses.get(200, 0)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput": total / elapsed,
+        "error_rate": errors / total if total else 0.0,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+def saturation_point(levels, min_gain, max_error_rate, slo_ms):
+    """First level past which adding clients stops helping (None if it never saturates)."""
+    best = None
+    for level in levels:
+        if level["error_rate"] > max_error_rate or (slo_ms and level["p99_ms"] > slo_ms):
+            return level["concurrency"]
+        if best is not None and level["throughput"] < best["throughput"] * (1 + min_gain):
+            return best["concurrency"]
+        if best is None or level["throughput"] > best["throughput"]:
+            best = level
+    return None
+
+
+def app_environment(args):
+    """Environment variables main.py reads for the engine settings given on the command line."""
+    env = {}
+    for option, variable in (
+        ("pool_mode", "ENGINE_POOL_MODE"),
+        ("engine_workers", "ENGINE_WORKERS"),
+        ("queue_limit", "ENGINE_QUEUE_LIMIT"),
+        ("job_timeout", "ENGINE_JOB_TIMEOUT"),
+        ("cache_size", "RESULT_CACHE_SIZE"),
+    ):
+        value = getattr(args, option)
+        if value is not None:
+            env[variable] = str(value)
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(args):
+    """Start `uvicorn main:app` on a free local port; returns (process, base url)."""
+    port = _free_port()
+    env = {**os.environ, **app_environment(args), "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=HERE, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 60 seconds")
+
+
+async def run(args, workload):
+    levels = []
+    timeout = httpx.Timeout(args.request_timeout)
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+
+    if args.server == "inprocess" and not args.url:
+        os.environ.update(app_environment(args))
+        import main  # reads the engine settings from the environment on import
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.lifespan(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+                for concurrency in args.concurrency:
+                    levels.append(await run_level(client, workload, concurrency, args.duration))
+                    print_level(levels[-1])
+        return levels
+
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_uvicorn(args)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+            for concurrency in args.concurrency:
+                levels.append(await run_level(client, workload, concurrency, args.duration))
+                print_level(levels[-1])
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return levels
+
+
+def print_header():
+    print(f"{'clients':>7}  {'req/s':>8}  {'p50 ms':>8}  {'p90 ms':>8}  {'p99 ms':>8}  {'max ms':>8}  {'errors':>7}")
+
+
+def print_level(level):
+    print(
+        f"{level['concurrency']:>7}  {level['throughput']:8.1f}  {level['p50_ms']:8.2f}  {level['p90_ms']:8.2f}"
+        f"  {level['p99_ms']:8.2f}  {level['max_ms']:8.2f}  {level['error_rate']:7.2%}",
+        flush=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the /validate service.")
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess",
+                        help="drive main.app in this process, or start a local uvicorn")
+    parser.add_argument("--url", help="test an already running server instead")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32",
+                        help="comma-separated numbers of concurrent clients, one level each")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default="", help="lesson weights, e.g. lesson1=3,lesson4=1 (default: equal)")
+    parser.add_argument("--corpus", help="JSON file {lesson_id: {case: code}} (default: bench_corpus)")
+    parser.add_argument("--unique", type=float, default=0.0,
+                        help="fraction of submissions made distinct so they miss the result cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--pool-mode", choices=("thread", "process", "sandbox", "inline"))
+    parser.add_argument("--engine-workers", type=int)
+    parser.add_argument("--queue-limit", type=int)
+    parser.add_argument("--job-timeout", type=float)
+    parser.add_argument("--cache-size", type=int, help="result cache entries (0 disables it)")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="throughput gain a level must add to count as not saturated (0.1 = 10%%)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo-ms", type=float, help="p99 latency above which a level counts as saturated")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    if httpx is None:
+        parser.error("load_test.py needs httpx: pip install httpx")
+    args.concurrency = [int(n) for n in args.concurrency.split(",")]
+
+    corpus = bench_corpus.CORPUS
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = json.load(f)
+    try:
+        mix = parse_mix(args.mix, list(corpus))
+    except ValueError as e:
+        parser.error(str(e))
+    workload = Workload(corpus, mix, args.unique, args.seed)
+
+    print_header()
+    levels = asyncio.run(run(args, workload))
+    saturated_at = saturation_point(levels, args.min_gain, args.max_error_rate, args.slo_ms)
+    if saturated_at is None:
+        print("No saturation point within the tested concurrency levels.")
+    else:
+        print(f"Saturation point: {saturated_at} concurrent clients")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "settings": {**vars(args), "app_environment": app_environment(args)},
+                "levels": levels,
+                "saturation_point": saturated_at,
+            }, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,67 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-
-# Import validators
-from lesson_validators import (
-    lesson1_validator,
-    lesson2_validator,
-    lesson3_validator,
-    lesson4_validator,
-    lesson5_validator
-)
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+# Import validators (driven by lesson_data.LESSONS)
+import lesson_validators
 
 # Import code execution engine
-from Cpp_engine import evaluate_output
+from Cpp_engine import evaluate_timed, timed
+from cpp_interpreter import LiveProgram, OutputStream, RunCancelled
+from result_cache import ResultCache
+from engine_pool import JobTimeout, PoolSaturated, WorkerCrashed, pool_from_env
+from metrics import Registry
+from profiling import profiled, profiler_from_env
+import lesson_registry
+
+# Per-request lines are logged at INFO; the default level keeps them off
+logger = logging.getLogger("codesim")
+logger.setLevel(os.environ.get("LOG_LEVEL", "WARNING").upper())
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+
+# Engine work runs in a bounded pool so one slow submission can't block the event loop
+engine_pool = pool_from_env()
+RETRY_AFTER_SECONDS = os.environ.get("ENGINE_RETRY_AFTER", "1")
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "1000"))
+# Longest submission accepted (characters); longer ones get 422 before any engine work
+MAX_CODE_LENGTH = int(os.environ.get("MAX_CODE_LENGTH", "20000"))
+# Batch items in the engine at once, across all batches, so batches can't starve /validate
+batch_slots = asyncio.Semaphore(engine_pool.max_workers)
+# Most steps an execution trace keeps (older steps are folded into its base state)
+TRACE_MAX_STEPS = int(os.environ.get("TRACE_MAX_STEPS", "1000"))
+# Off unless PROFILE_SAMPLE_EVERY is set; PROFILE_DUMP_PATH also writes the profile at shutdown
+profiler = profiler_from_env()
+PROFILE_DUMP_PATH = os.environ.get("PROFILE_DUMP_PATH")
+# /admin endpoints need this in an X-Admin-Token header; without one they only answer localhost
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    engine_pool.start()
+    lesson_registry.warm_up()
+    for lesson_id in lesson_registry.get_lessons():
+        lesson_validators.get_plan(lesson_id)
+    yield
+    engine_pool.shutdown()
+    if PROFILE_DUMP_PATH and profiler.samples:
+        profiler.dump(PROFILE_DUMP_PATH)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS - UPDATE THIS for production
 app.add_middleware(
@@ -27,61 +74,442 @@ app.add_middleware(
 # Request schema
 class CodeRequest(BaseModel):
     lesson_id: str
-    code: str
-
-# Expected outputs (from your existing dict)
-lesson_expected_output = {
-    "lesson1": "16",
-    "lesson2": "Alex",
-    "lesson3": "Large",
-    "lesson4": "Iteration 0Iteration 1Iteration 2",
-    "lesson5": "0,00,1,01,0,11,1,1"
-}
-
-# ✅ Your dictionary of validators
-lesson_validators = {
-    "lesson1": lesson1_validator,
-    "lesson2": lesson2_validator,
-    "lesson3": lesson3_validator,
-    "lesson4": lesson4_validator,
-    "lesson5": lesson5_validator,
-}
+    code: str = Field(max_length=MAX_CODE_LENGTH)
+    trace: bool = False  # include a step-by-step execution trace
 
-@app.post("/validate")
-async def validate_lesson(req: CodeRequest):
-    lesson_id = req.lesson_id
-    code = req.code
 
-    print("🔥 USING ADVANCED VALIDATOR 🔥")
+class BatchRequest(BaseModel):
+    items: list[CodeRequest]
+
+
+class LiveRequest(BaseModel):
+    session_id: str  # one per editor; the client debounces keystrokes
+    lesson_id: str
+    code: str = Field(max_length=MAX_CODE_LENGTH)
 
-    # Make sure lesson ID is valid
-    if lesson_id not in lesson_validators:
-        raise HTTPException(status_code=400, detail="Invalid lesson ID.")
 
-    # Run engine on code
-    result = evaluate_output(code)
+class StreamMessage(BaseModel):
+    lesson_id: str
+    code: str = Field(max_length=MAX_CODE_LENGTH)
+    id: int | str | None = None  # echoed back so the client can match replies
+
+# Identical (or whitespace/comment-only different) submissions share a result
+result_cache = ResultCache(
+    maxsize=int(os.environ.get("RESULT_CACHE_SIZE", "2048")),
+    ttl=float(os.environ.get("RESULT_CACHE_TTL", "3600")),
+)
+
+# session id -> LiveProgram with the last version /validate/live saw from that editor
+live_sessions = ResultCache(
+    maxsize=int(os.environ.get("LIVE_SESSIONS", "1024")),
+    ttl=float(os.environ.get("LIVE_SESSION_TTL", "900")),
+)
+
+# ---- /metrics ----
+metrics = Registry()
+REQUESTS = metrics.counter(
+    "codesim_requests_total", "Submissions handled, by endpoint, lesson and status.",
+    ("endpoint", "lesson", "status"),
+)
+REQUEST_SECONDS = metrics.histogram(
+    "codesim_request_seconds", "Time to answer a submission, including queueing and cache lookups.",
+    ("endpoint", "lesson"),
+)
+STAGE_SECONDS = metrics.histogram(
+    "codesim_stage_seconds", "Engine time per stage of an uncached run.",
+    ("lesson", "stage"),
+)
+metrics.gauge("codesim_engine_queue_depth", "Engine jobs running or waiting.", engine_pool.queue_depth)
+metrics.gauge("codesim_engine_queue_limit", "Queue depth at which requests get 503.", lambda: engine_pool.max_queue)
+for _stat, _kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                     ("size", "gauge"), ("hit_rate", "gauge")):
+    metrics.gauge(
+        f"codesim_result_cache_{_stat}" + ("_total" if _kind == "counter" else ""),
+        f"Result cache {_stat.replace('_', ' ')}.",
+        lambda stat=_stat: result_cache.stats()[stat],
+        kind=_kind,
+    )
+metrics.gauge("codesim_live_sessions", "Live-typing sessions held in memory.", lambda: live_sessions.stats()["size"])
+
+
+def record_request(endpoint: str, lesson_id: str, status, seconds: float):
+    lesson = lesson_id if lesson_validators.is_lesson(lesson_id) else "invalid"
+    REQUESTS.inc(endpoint, lesson, str(status))
+    REQUEST_SECONDS.observe(seconds, endpoint, lesson)
+    logger.info("request endpoint=%s lesson=%s status=%s seconds=%.6f", endpoint, lesson, status, seconds)
+
+
+@contextmanager
+def observe_request(endpoint: str, lesson_id: str):
+    """Count and time one HTTP submission; an HTTPException is recorded with its status."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        yield
+        status = 200
+    except HTTPException as e:
+        status = e.status_code
+        raise
+    finally:
+        record_request(endpoint, lesson_id, status, time.perf_counter() - start)
+
+
+def record_stages(lesson_id: str, timings: dict):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, lesson_id, stage)
+
+
+async def run_engine(lesson_id: str, fn, *args, trace: bool = False):
+    """
+    Run fn(*args) -> (engine result, timings) in the engine pool (that is
+    evaluate_timed or run_live_evaluation), then build the /validate response
+    here. Records the stage timings, and feeds sampled runs to the profiler.
+    """
+    if profiler.sample():
+        if profiler.mode == "cprofile":
+            result, timings, raw_stats = await engine_pool.run(profiled, fn, *args)
+        else:
+            (result, timings), raw_stats = await engine_pool.run(fn, *args), None
+        response = validation_response(lesson_id, result, timings, trace)
+        profiler.add(lesson_id, timings, raw_stats)
+    else:
+        result, timings = await engine_pool.run(fn, *args)
+        response = validation_response(lesson_id, result, timings, trace)
+    record_stages(lesson_id, timings)
+    return response
+
+
+def validation_response(lesson_id: str, result: dict, timings: dict, trace: bool = False):
+    """Run the lesson validator on an engine result and build the /validate response."""
+    plan = lesson_validators.get_plan(lesson_id)
 
     if not result["success"]:
-        return {
+        response = {
             "success": False,
             "feedback": result["error"],
             "your_output": "",
-            "output": lesson_expected_output[lesson_id],
+            "output": plan["sample_output"],
         }
+        if trace:
+            response["trace"] = result.get("loop_trace", [])
+        return response
 
-    # Run lesson-specific validator
-    validator = lesson_validators[lesson_id]
-    ok, feedback = validator(code, result)
+    # Run the lesson's checks
+    with timed(timings, "validator"):
+        ok, feedback = lesson_validators.validate(lesson_id, result)
 
-    # For lessons 1 and 2 → use raw_output only
-    if lesson_id in ["lesson1", "lesson2"]:
-        final_output = result["raw_output"]
-    else:
-        final_output = result["output"]
+    # Lessons 1 and 2 show raw cout output, the rest the simulated output
+    final_output = result[plan["output_source"]]
 
-    return {
+    response = {
         "success": ok,
         "feedback": feedback,
         "output": final_output,
         "your_output": final_output,
     }
+    if trace:
+        response["trace"] = result["loop_trace"]
+    return response
+
+
+# Keys for sources up to this long are computed on the event loop: hashing
+# them costs less than handing them to a thread
+INLINE_KEY_LENGTH = 256
+
+
+async def cache_key(lesson_id: str, code: str) -> str:
+    """result_cache.key, off the event loop unless the source is short (it lexes the whole source)."""
+    if len(code) <= INLINE_KEY_LENGTH:
+        return result_cache.key(lesson_id, code)
+    return await asyncio.to_thread(result_cache.key, lesson_id, code)
+
+
+async def cached_validation(lesson_id: str, code: str, key: str):
+    """Cached /validate response, run in the engine pool (may raise PoolSaturated / JobTimeout)."""
+    response = result_cache.get(key)
+    if response is None:
+        response = await run_engine(lesson_id, evaluate_timed, code)
+        result_cache.put(key, response)
+    return response
+
+
+@app.post("/validate")
+async def validate_lesson(req: CodeRequest):
+    with observe_request("validate", req.lesson_id):
+        return await _validate_lesson(req)
+
+
+async def _validate_lesson(req: CodeRequest):
+    lesson_id = req.lesson_id
+    code = req.code
+
+    # Make sure lesson ID is valid
+    if not lesson_validators.is_lesson(lesson_id):
+        raise HTTPException(status_code=400, detail="Invalid lesson ID.")
+
+    try:
+        if req.trace:
+            # Traces refer to source lines, so formatting variants can't share one: not cached
+            return await run_engine(lesson_id, evaluate_timed, code, TRACE_MAX_STEPS, trace=True)
+        return await cached_validation(lesson_id, code, await cache_key(lesson_id, code))
+    except PoolSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again.",
+            headers={"Retry-After": RETRY_AFTER_SECONDS},
+        )
+    except JobTimeout:
+        raise HTTPException(status_code=504, detail="Your code took too long to run.")
+    except WorkerCrashed:
+        raise HTTPException(status_code=422, detail="Your code used too many resources to run.")
+
+
+def run_live_evaluation(code: str, session: LiveProgram, stream=None):
+    """
+    evaluate_timed that re-runs only what changed since the session's last
+    version, sending the program's output to `stream` (if given) as it runs.
+    """
+    with session.lock:
+        result = evaluate_timed(code, 0, session, stream)
+    if stream is not None:
+        stream.flush()
+    return result
+
+
+async def live_validation(lesson_id: str, code: str, session: LiveProgram, stream=None):
+    """Cached /validate response via run_live_evaluation in the engine pool (may raise PoolSaturated / JobTimeout)."""
+    key = await cache_key(lesson_id, code)
+    if engine_pool.mode not in ("thread", "inline"):
+        # Sessions and streams live in this process; worker processes can't share them
+        return await cached_validation(lesson_id, code, key)
+
+    response = result_cache.get(key)
+    if response is None:
+        response = await run_engine(lesson_id, run_live_evaluation, code, session, stream)
+        result_cache.put(key, response)
+    return response
+
+
+@app.post("/validate/live")
+async def validate_live(req: LiveRequest):
+    """
+    /validate for live feedback while the student types. Responses are the
+    same as /validate; the session remembers the previous version so only
+    the statements from the first changed line on are parsed and run again.
+    """
+    with observe_request("live", req.lesson_id):
+        if not lesson_validators.is_lesson(req.lesson_id):
+            raise HTTPException(status_code=400, detail="Invalid lesson ID.")
+
+        session = live_sessions.get(req.session_id)
+        if session is None:
+            session = LiveProgram()
+            live_sessions.put(req.session_id, session)
+        try:
+            return await live_validation(req.lesson_id, req.code, session)
+        except PoolSaturated:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please try again.",
+                headers={"Retry-After": RETRY_AFTER_SECONDS},
+            )
+        except JobTimeout:
+            raise HTTPException(status_code=504, detail="Your code took too long to run.")
+        except WorkerCrashed:
+            raise HTTPException(status_code=422, detail="Your code used too many resources to run.")
+
+
+@app.websocket("/ws/validate")
+async def validate_stream(websocket: WebSocket):
+    """
+    Live validation over one long-lived connection.
+
+    The client sends {"lesson_id", "code", "id"} messages; each new one
+    cancels the run still in flight for the previous one. For every
+    submission the server sends {"type": "output", "id", "text"} chunks as
+    the program prints, then {"type": "result", "id", ...} holding the
+    /validate response, or {"type": "error", "id", "status", "detail"} with
+    the status /validate would have answered. Output is only streamed in
+    thread/inline pool mode (and not for cached results); "result" is always
+    the complete answer.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue()  # one sender keeps chunks and results in order
+    session = LiveProgram()
+    current = None  # (task, cancelled) for the submission in flight
+
+    def error(msg_id, status, detail):
+        return {"type": "error", "id": msg_id, "status": status, "detail": detail}
+
+    async def send_all():
+        while True:
+            await websocket.send_json(await outbox.get())
+
+    async def run(msg: StreamMessage, cancelled: threading.Event):
+        def send_output(text):
+            if not cancelled.is_set():
+                outbox.put_nowait({"type": "output", "id": msg.id, "text": text})
+
+        stream = OutputStream(lambda text: loop.call_soon_threadsafe(send_output, text), cancelled)
+        start = time.perf_counter()
+        try:
+            response = await live_validation(msg.lesson_id, msg.code, session, stream)
+            reply = {"type": "result", "id": msg.id, **response}
+        except RunCancelled:
+            return
+        except PoolSaturated:
+            reply = error(msg.id, 503, "Server is busy, please try again.")
+        except JobTimeout:
+            cancelled.set()  # stop the worker thread at its next step
+            reply = error(msg.id, 504, "Your code took too long to run.")
+        except WorkerCrashed:
+            reply = error(msg.id, 422, "Your code used too many resources to run.")
+        record_request("ws", msg.lesson_id, reply.get("status", 200), time.perf_counter() - start)
+        outbox.put_nowait(reply)
+
+    sender = asyncio.ensure_future(send_all())
+    try:
+        while True:
+            data = await websocket.receive_text()
+            if current is not None:
+                current[1].set()
+                current[0].cancel()
+                current = None
+
+            try:
+                msg = StreamMessage.model_validate_json(data)
+            except ValidationError as e:
+                if any(err["type"] == "string_too_long" for err in e.errors()):
+                    detail = f"Code must be at most {MAX_CODE_LENGTH} characters."
+                else:
+                    detail = "Expected {\"lesson_id\", \"code\"} as JSON."
+                outbox.put_nowait(error(None, 422, detail))
+                continue
+            if not lesson_validators.is_lesson(msg.lesson_id):
+                outbox.put_nowait(error(msg.id, 400, "Invalid lesson ID."))
+                continue
+
+            cancelled = threading.Event()
+            current = (asyncio.ensure_future(run(msg, cancelled)), cancelled)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if current is not None:
+            current[1].set()
+            current[0].cancel()
+        sender.cancel()
+
+
+@app.post("/validate/batch")
+async def validate_batch(req: BatchRequest):
+    """
+    Validate many submissions at once (e.g. re-grading a class).
+
+    Identical submissions are run once. Results stream back as NDJSON in
+    request order; each line is a /validate response plus the "index" of
+    the item in the request.
+    """
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch.")
+
+    rejected = []
+    valid = []
+    for index, item in enumerate(req.items):
+        if lesson_validators.is_lesson(item.lesson_id):
+            valid.append((index, item))
+        else:
+            rejected.append({"index": index, "success": False, "feedback": "Invalid lesson ID."})
+
+    # Every key in one hop off the event loop
+    keys = await asyncio.to_thread(lambda: [result_cache.key(item.lesson_id, item.code) for _, item in valid])
+    groups = {}  # cache key -> (lesson_id, code, [item indexes])
+    for (index, item), key in zip(valid, keys):
+        groups.setdefault(key, (item.lesson_id, item.code, []))[2].append(index)
+
+    async def run_group(key):
+        lesson_id, code, _ = groups[key]
+        async with batch_slots:
+            start = time.perf_counter()
+            while True:
+                try:
+                    response = await cached_validation(lesson_id, code, key)
+                    record_request("batch", lesson_id, 200, time.perf_counter() - start)
+                    return key, response
+                except PoolSaturated:
+                    await asyncio.sleep(0.05)
+                except (JobTimeout, WorkerCrashed) as e:
+                    status = 504 if isinstance(e, JobTimeout) else 422
+                    record_request("batch", lesson_id, status, time.perf_counter() - start)
+                    return key, {
+                        "success": False,
+                        "feedback": "Your code took too long to run." if isinstance(e, JobTimeout)
+                        else "Your code used too many resources to run.",
+                        "output": "",
+                        "your_output": "",
+                    }
+                except Exception:
+                    # One bad submission must not end the stream for the rest of the batch
+                    logger.exception("batch item failed lesson=%s", lesson_id)
+                    record_request("batch", lesson_id, 500, time.perf_counter() - start)
+                    return key, {
+                        "success": False,
+                        "feedback": "Something went wrong while checking your code.",
+                        "output": "",
+                        "your_output": "",
+                    }
+
+    async def stream():
+        # Lines go out in input order, each as soon as it and all before it are done
+        ready = {line["index"]: line for line in rejected}
+        next_index = 0
+        tasks = [asyncio.ensure_future(run_group(key)) for key in groups]
+        try:
+            for done in [None, *asyncio.as_completed(tasks)]:
+                if done is not None:
+                    key, response = await done
+                    for index in groups[key][2]:
+                        ready[index] = {"index": index, **response}
+                while next_index in ready:
+                    yield json.dumps(ready.pop(next_index)) + "\n"
+                    next_index += 1
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(metrics.render(), media_type=Registry.CONTENT_TYPE)
+
+
+def require_admin(request: Request):
+    """403 unless the request carries ADMIN_TOKEN, or comes from this machine when none is set."""
+    if ADMIN_TOKEN:
+        token = request.headers.get("X-Admin-Token", "")
+        if hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return
+    elif request.client is not None and request.client.host in ("127.0.0.1", "::1"):
+        return
+    raise HTTPException(status_code=403, detail="Forbidden.")
+
+
+@app.get("/admin/profile")
+def get_profile(request: Request, top: int = 30):
+    """Aggregated profile of the sampled runs (404 unless PROFILE_SAMPLE_EVERY is set)."""
+    require_admin(request)
+    if not profiler.every:
+        raise HTTPException(status_code=404, detail="Profiling is off.")
+    return profiler.report(top)
+
+
+@app.delete("/admin/profile")
+def reset_profile(request: Request):
+    require_admin(request)
+    if not profiler.every:
+        raise HTTPException(status_code=404, detail="Profiling is off.")
+    profiler.reset()
+    return {"reset": True}
@@ -0,0 +1,84 @@
+import re
+from functools import lru_cache
+
+# Every regular expression the C++ engine and the lesson validators use,
+# compiled once at import. Code calls these pattern objects directly rather
+# than passing pattern strings to re.*, which looks each string up in re's
+# internal cache on every call and recompiles it once that cache has been
+# churned by enough other patterns.
+
+# C++ lexer: one alternation, so the source is lexed in a single left-to-right pass
+TOKEN = re.compile(r'''
+      (?P<ws>\s+)
+    | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<pp>\#[^\n]*)
+    | (?P<string>"(?:[^"\\\n]|\\.)*"?)
+    | (?P<char>'(?:[^'\\\n]|\\.)*'?)
+    | (?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?[fFuUlL]*|\.\d+(?:[eE][+-]?\d+)?[fF]?)
+    | (?P<ident>[A-Za-z_]\w*)
+    | (?P<op><<=|>>=|<<|>>|\+\+|--|->|::|&&|\|\||[-+*/%=!<>&|^]=|.)
+''', re.VERBOSE | re.DOTALL)
+
+NEWLINE = re.compile(r"\n")
+
+# A "program" that is just a number, e.g. "16"
+DIGITS = re.compile(r"\d+")
+
+
+@lru_cache(maxsize=None)
+def compiled(pattern: str) -> re.Pattern:
+    """Compiled form of a pattern string from lesson data, kept for the life of the process."""
+    return re.compile(pattern)
+
+
+def _benchmark(n=20_000):
+    """Per-call cost of the engine's regex work: pattern strings through re.* vs this registry."""
+    import timeit
+
+    import bench_corpus
+    from cpp_parser import source_tokens, normalize_source, parse_program, tokenize
+
+    code = bench_corpus.CORPUS["lesson5"]["correct"]
+    trimmed = "16"
+
+    def per_call(stmt, number=n):
+        return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+    def thrashed(stmt):
+        # More than re's cache holds are in use: every string pattern is recompiled
+        def run():
+            re.purge()
+            stmt()
+        return per_call(run, n // 10) - per_call(re.purge, n // 10)
+
+    print("single call                         us/call")
+    for label, by_string, by_registry in (
+        ("fullmatch digits", lambda: re.fullmatch(r"\d+", trimmed), lambda: DIGITS.fullmatch(trimmed)),
+        ("finditer newlines",
+         lambda: [m.start() for m in re.finditer(r"\n", code)],
+         lambda: [m.start() for m in NEWLINE.finditer(code)]),
+    ):
+        print(f"  {label:<18} re.* warm cache   {per_call(by_string):8.2f}")
+        print(f"  {label:<18} re.* thrashed     {thrashed(by_string):8.2f}")
+        print(f"  {label:<18} registry          {per_call(by_registry):8.2f}")
+
+    # Uncached request: the result-cache key and the parser used to lex the source separately
+    def lexed_twice():
+        source_tokens.cache_clear()
+        parse_program.cache_clear()
+        " ".join(tok[1] for tok in tokenize(code))
+        parse_program(code)
+
+    def lexed_once():
+        source_tokens.cache_clear()
+        parse_program.cache_clear()
+        normalize_source(code)
+        parse_program(code)
+
+    print("per uncached request (lesson5 'correct')")
+    print(f"  cache key + parse, lexed twice          {per_call(lexed_twice, n // 10):8.2f}")
+    print(f"  cache key + parse, lexed once           {per_call(lexed_once, n // 10):8.2f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,181 @@
+import itertools
+import os
+import random
+import sqlite3
+import threading
+from functools import lru_cache
+
+PROBLEM_TYPES = ("factoring", "quadratic")
+DIFFICULTIES = ("easy", "medium", "hard")
+
+DEFAULT_PATH = os.environ.get(
+    "PROBLEM_BANK_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "problem_bank.sqlite3"),
+)
+
+# Bump when the generators' output format changes so stale banks are rebuilt
+BANK_VERSION = 2
+
+
+@lru_cache(maxsize=None)
+def seeds_by_params(difficulty):
+    """
+    {params: smallest seed whose generator draws them} for every parameter
+    combination of `difficulty`, so each bank problem has the same id that
+    problem_engine.generate_problem_dict would give it.
+    """
+    import problem_engine
+
+    total = 1
+    for lo, hi in problem_engine.PARAM_RANGES[difficulty]:
+        total *= hi - lo + 1
+    seeds = {}
+    seed = 0
+    while len(seeds) < total:
+        seeds.setdefault(problem_engine.draw_params(difficulty, random.Random(seed)), seed)
+        seed += 1
+    return seeds
+
+
+def enumerate_problems(problem_type, difficulty):
+    """
+    Yield (seed, problem, solution) for every parameter combination the
+    generator can draw, in itertools.product order. Needs sympy.
+    """
+    import problem_engine
+
+    build = problem_engine.build_qfactor if problem_type == "factoring" else problem_engine.build_quad
+    ranges = [range(lo, hi + 1) for lo, hi in problem_engine.PARAM_RANGES[difficulty]]
+    seeds = seeds_by_params(difficulty)
+    for params in itertools.product(*ranges):
+        problem, solution = build(difficulty, params)
+        yield seeds[params], str(problem), str(solution)
+
+
+def build_bank(path=DEFAULT_PATH):
+    """
+    Generate every problem once and write them to an SQLite file at `path`.
+    The file is written next to `path` and moved into place, so readers
+    never see a half-built bank.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE problems ("
+            " problem_type TEXT, difficulty TEXT, idx INTEGER,"
+            " seed INTEGER, problem TEXT, solution TEXT,"
+            " PRIMARY KEY (problem_type, difficulty, idx)"
+            ") WITHOUT ROWID"
+        )
+        for problem_type in PROBLEM_TYPES:
+            for difficulty in DIFFICULTIES:
+                conn.executemany(
+                    "INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (problem_type, difficulty, idx, *problem)
+                        for idx, problem in enumerate(enumerate_problems(problem_type, difficulty))
+                    ),
+                )
+        conn.execute("INSERT INTO meta VALUES ('version', ?)", (str(BANK_VERSION),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, path)
+
+
+class ProblemBank:
+    """
+    Read-only access to a built problem bank.
+
+    Problem counts are loaded once; get() is a single primary-key lookup, and
+    nothing here imports sympy. Each thread gets its own SQLite connection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        rows = self._conn().execute(
+            "SELECT problem_type, difficulty, COUNT(*) FROM problems GROUP BY problem_type, difficulty"
+        )
+        self.counts = {(problem_type, difficulty): n for problem_type, difficulty, n in rows}
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def count(self, problem_type="factoring", difficulty="easy"):
+        return self.counts.get((problem_type, difficulty), 0)
+
+    def get(self, problem_type, difficulty, index):
+        """(seed, problem, solution) for one problem; raises IndexError if out of range."""
+        row = self._conn().execute(
+            "SELECT seed, problem, solution FROM problems WHERE problem_type = ? AND difficulty = ? AND idx = ?",
+            (problem_type, difficulty, index),
+        ).fetchone()
+        if row is None:
+            raise IndexError(f"No {difficulty} {problem_type} problem #{index}")
+        return row
+
+    def random_problem_dict(self, problem_type="factoring", difficulty="easy", rng=random):
+        """Same shape as problem_engine.generate_problem_dict, served from the bank."""
+        n = self.count(problem_type, difficulty)
+        if n == 0:
+            raise ValueError(f"Unknown problem type/difficulty: {problem_type}/{difficulty}")
+        from problem_engine import make_problem_id  # problem_engine loads sympy lazily
+
+        seed, problem, solution = self.get(problem_type, difficulty, rng.randrange(n))
+        return {
+            "Problem: ": problem,
+            "Solution: ": solution,
+            "Problem Type: ": problem_type,
+            "Difficulty: ": difficulty,
+            "Problem ID: ": make_problem_id(problem_type, difficulty, seed),
+        }
+
+
+def _bank_version(path):
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return int(row[0]) if row else None
+
+
+_banks = {}  # path -> ProblemBank, or None when no up-to-date bank is there
+_bank_lock = threading.Lock()
+
+
+def get_bank(path=None):
+    """
+    Shared ProblemBank for `path` (default PROBLEM_BANK_PATH), or None if the
+    file is missing or out of date. The bank is never built here: that takes
+    sympy and several seconds, so it belongs in the deploy build step
+    (python problem_bank.py); without it problems are generated as before.
+    """
+    path = path or DEFAULT_PATH
+    if path not in _banks:
+        with _bank_lock:
+            if path not in _banks:
+                current = os.path.exists(path) and _bank_version(path) == BANK_VERSION
+                _banks[path] = ProblemBank(path) if current else None
+    return _banks[path]
+
+
+if __name__ == "__main__":
+    # Pre-build the bank (e.g. in the deploy build step) so no worker pays for it
+    build_bank()
+    bank = ProblemBank()
+    print(f"Built {sum(bank.counts.values())} problems into {bank.path}")
@@ -1,87 +1,444 @@
-import sympy as sp 
 import random
-from sympy import factor, Rational
+import re
+import time
+from fractions import Fraction
+from functools import lru_cache
 
+import problem_bank
 
+# sympy takes ~1s and tens of MB to import, so it is only loaded the first
+# time a problem is generated or checked (the /validate service never does).
+@lru_cache(maxsize=None)
+def _sympy():
+    import sympy
+    return sympy
 
-x = sp.Symbol('x') #turns x into a symbolic variable
+@lru_cache(maxsize=None)
+def _numpy():
+    import numpy        # only needed for bulk generation
+    return numpy
 
-def generate_qfactor(difficulty = "easy"):
-    if difficulty == "easy":
-        a = random.randint(1,10)
-        b = random.randint(1,10)
+@lru_cache(maxsize=None)
+def _symbol_x():
+    return _sympy().Symbol('x') #turns x into a symbolic variable
 
-        factor = ((x + a) * (x + b))
-        formula = sp.expand(factor)
-        return formula, factor      # returns the problem(formula) and solution(factor)
-    
-    elif difficulty == "medium":
-        a = random.randint(1,20)
-        b = random.randint(1,20)
+def __getattr__(name):
+    # keep problem_engine.sp / .x / .Rational / .factor working without an eager import
+    if name == "sp":
+        return _sympy()
+    if name == "x":
+        return _symbol_x()
+    if name in ("Rational", "factor"):
+        return getattr(_sympy(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        factor = ((x + a) * (x + b))
-        formula = sp.expand(factor)
-        return formula, factor      # returns the problem(formula) and solution(factor)
-    
-    elif difficulty == "hard":
-        a = random.randint(1,10)
-        b = random.randint(1,10)        #these 2 combine to make the fraction ^
-        c = random.randint(1,10)
+def _squarefree_split(n):
+    """n = s*s*m with m squarefree (n > 0); returns (s, m)."""
+    s, m = 1, 1
+    p = 2
+    while p * p <= n:
+        while n % (p * p) == 0:
+            n //= p * p
+            s *= p
+        if n % p == 0:
+            n //= p
+            m *= p
+        p += 1
+    return s, m * n
 
-        d = Rational(a, b)      # a/b is a fraction
+def solve_quadratic(a, b, c):
+    """
+    Exact roots of a*x**2 + b*x + c for rational a (non-zero), b and c,
+    straight from the discriminant (no sympy).
 
-        factor = ((x + d) * (x + c))
-        formula = sp.expand(factor)
-        return formula, factor      # returns the equation(formula) and solution(factor)
+    Returns a list of (p, q, m) tuples, each meaning p + q*sqrt(m) with
+    Fractions p, q and a squarefree int m (m < 0 for complex roots).
+    Rational roots have q == 0; a double root is listed once.
+    """
+    a, b, c = Fraction(a), Fraction(b), Fraction(c)
+    if a == 0:
+        raise ValueError("Not a quadratic: leading coefficient is 0")
 
+    p = -b / (2 * a)
+    disc = b * b - 4 * a * c
+    if disc == 0:
+        return [(p, Fraction(0), 1)]
 
-def generate_quad(difficulty = "easy"):
-    if difficulty == "easy":
-        a = random.randint(1,10)
-        b = random.randint(1,10)
+    # sqrt(n/d) = sqrt(n*d)/d, then pull square factors out of n*d
+    n, d = disc.numerator, disc.denominator
+    s, m = _squarefree_split(abs(n * d))
+    if n < 0:
+        m = -m
+    q = Fraction(s, d) / abs(2 * a)
 
-        equation = ((x ** 2) + (a * x) + b)
-        solution = sp.solve(equation)           #return the roots of the quadratic
-        return equation, solution               #function returns the equation and solution
-     
-    elif difficulty == "medium":
-        a = random.randint(1,20)
-        b = random.randint(1,20)
+    if m == 1:
+        return [(p - q, Fraction(0), 1), (p + q, Fraction(0), 1)]
+    return [(p, -q, m), (p, q, m)]
 
-        equation = ((x ** 2) + (a * x) + b)
-        solution = sp.solve(equation)           #return the roots of the quadratic
-        return equation, solution               #function returns the equation and solution
-    
-    elif difficulty == "hard":
-        a = random.randint(1,10)
-        b = random.randint(1,10)            #^ these two variables will combine to form a fraction
-        c = random.randint(1,10)
+def roots_to_sympy(roots):
+    """solve_quadratic roots as sympy numbers, in the same order sp.solve returns them."""
+    sp = _sympy()
+    exprs = [
+        sp.Rational(p.numerator, p.denominator)
+        + sp.Rational(q.numerator, q.denominator) * sp.sqrt(m)
+        for p, q, m in roots
+    ]
+    return sorted(exprs, key=sp.default_sort_key)
+
+def _quadratic_coeffs(expr):
+    """[a, b, c] as Fractions if expr is a quadratic in x with rational coefficients, else None."""
+    sp = _sympy()
+    try:
+        poly = sp.Poly(sp.sympify(expr), _symbol_x())
+    except (sp.PolynomialError, sp.SympifyError):
+        return None
+    if poly.degree() != 2:
+        return None
+    coeffs = poly.all_coeffs()
+    if not all(coeff.is_Rational for coeff in coeffs):
+        return None
+    return [Fraction(int(coeff.p), int(coeff.q)) for coeff in coeffs]
+
+# ---------------------------
+# Exact polynomial parsing (factoring answers)
+# ---------------------------
+
+class PolynomialParseError(ValueError):
+    """The answer is not a valid expression."""
+
+class _NotPolynomial(Exception):
+    """Valid maths, but outside what the fast checker handles (other symbols, sqrt, 1/x ...)."""
+
+MAX_POLY_DEGREE = 64
+# Largest numerator/denominator a coefficient may reach; answers to the generated
+# problems stay tiny, so anything bigger is rejected rather than computed
+MAX_COEFF_BITS = 1024
+
+_POLY_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|([A-Za-z_]\w*)|(\*\*|[-+*/^()]))')
+
+def _poly_tokens(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _POLY_TOKEN.match(text, pos)
+        if m is None:
+            raise PolynomialParseError(f"Unexpected character: {text[pos:].strip()[:1]!r}")
+        number, name, op = m.groups()
+        if number is not None:
+            try:
+                value = Fraction(number)
+            except ValueError:  # more digits than int() will convert
+                raise PolynomialParseError("Number too large") from None
+            tokens.append(("num", value))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append(("op", "**" if op == "^" else op))
+        pos = m.end()
+    return tokens
+
+def _poly_trim(p):
+    while len(p) > 1 and p[-1] == 0:
+        p.pop()
+    for c in p:
+        if c.numerator.bit_length() > MAX_COEFF_BITS or c.denominator.bit_length() > MAX_COEFF_BITS:
+            raise PolynomialParseError("Number too large")
+    return p
+
+def _poly_add(p, q, sign = 1):
+    out = [Fraction(0)] * max(len(p), len(q))
+    for i, c in enumerate(p):
+        out[i] += c
+    for i, c in enumerate(q):
+        out[i] += sign * c
+    return _poly_trim(out)
+
+def _poly_mul(p, q):
+    if len(p) + len(q) - 2 > MAX_POLY_DEGREE:
+        raise _NotPolynomial()
+    out = [Fraction(0)] * (len(p) + len(q) - 1)
+    for i, a in enumerate(p):
+        if a:
+            for j, b in enumerate(q):
+                out[i + j] += a * b
+    return _poly_trim(out)
+
+class _PolyParser:
+    """
+    Recursive descent over  expr := term (+|- term)*,  term := unary ((*|/|implicit) unary)*,
+    unary := (+|-) unary | power,  power := atom (** unary)?,  atom := number | x | ( expr ).
+    Polynomials are coefficient lists, lowest power first.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        if not self.tokens:
+            raise PolynomialParseError("Empty answer")
+        p = self.expr()
+        if self.pos != len(self.tokens):
+            raise PolynomialParseError(f"Unexpected {self.peek()[1]!r}")
+        return p
+
+    def expr(self):
+        p = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            sign = 1 if self.take()[1] == "+" else -1
+            p = _poly_add(p, self.term(), sign)
+        return p
+
+    def term(self):
+        p = self.unary()
+        while True:
+            kind, value = self.peek()
+            if (kind, value) == ("op", "*"):
+                self.take()
+                p = _poly_mul(p, self.unary())
+            elif (kind, value) == ("op", "/"):
+                self.take()
+                q = self.unary()
+                if len(q) != 1:
+                    raise _NotPolynomial()       # division by a polynomial
+                if q[0] == 0:
+                    raise PolynomialParseError("Division by zero")
+                p = _poly_trim([c / q[0] for c in p])
+            elif kind in ("num", "name") or (kind, value) == ("op", "("):
+                p = _poly_mul(p, self.unary())   # implicit: 2x, (x+1)(x+2)
+            else:
+                return p
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return [-c for c in self.unary()]
+        if self.peek() == ("op", "+"):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() != ("op", "**"):
+            return base
+        self.take()
+        exponent = self.unary()
+        if len(exponent) != 1 or exponent[0].denominator != 1 or exponent[0] < 0:
+            raise _NotPolynomial()
+        n = int(exponent[0])
+        if n > MAX_POLY_DEGREE:
+            # Even a constant base: 9**9**9 has far too many digits to compute
+            raise PolynomialParseError("Exponent too large")
+        if (len(base) - 1) * n > MAX_POLY_DEGREE:
+            raise _NotPolynomial()
+        result = [Fraction(1)]
+        for _ in range(n):
+            result = _poly_mul(result, base)
+        return result
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            return [value]
+        if kind == "name":
+            if value != "x":
+                raise _NotPolynomial()
+            return [Fraction(0), Fraction(1)]
+        if (kind, value) == ("op", "("):
+            p = self.expr()
+            if self.take() != ("op", ")"):
+                raise PolynomialParseError("Missing ')'")
+            return p
+        raise PolynomialParseError("Unexpected end of answer" if kind is None else f"Unexpected {value!r}")
+
+def parse_polynomial(text):
+    """
+    Parse a polynomial in x such as "(x + 3)(x + 2)", "x^2 + 5x + 6" or
+    "x**2 + 23*x/10 + 3/5" into exact coefficients, lowest power first.
+    Raises PolynomialParseError for invalid input and _NotPolynomial for
+    expressions outside polynomial arithmetic in x.
+    """
+    try:
+        return _PolyParser(_poly_tokens(str(text))).parse()
+    except RecursionError:
+        raise PolynomialParseError("Answer is nested too deeply") from None
+
+def _power_exponent(tokens, i):
+    """
+    The exponent after the ** at tokens[i] if it is a number, optionally
+    signed and/or parenthesised (x**-1, x**(-2)); None for anything else.
+    """
+    rest = tokens[i + 1:i + 5] + [(None, None)] * 4
+    parenthesised = rest[0] == ("op", "(")
+    if parenthesised:
+        rest = rest[1:]
+    sign = 1
+    if rest[0] in (("op", "-"), ("op", "+")):
+        sign = -1 if rest[0][1] == "-" else 1
+        rest = rest[1:]
+    if rest[0][0] != "num" or (parenthesised and rest[1] != ("op", ")")):
+        return None
+    return sign * rest[0][1]
+
+def _small_powers(text):
+    """
+    True if every exponent in text is a plain (possibly negative) number and
+    together their sizes multiply to at most MAX_POLY_DEGREE. sympy evaluates
+    powers exactly, so 9**9**9 or ((2**60)**60)**60 would never finish expanding.
+    """
+    tokens = _poly_tokens(text)
+    total = 1
+    for i, tok in enumerate(tokens):
+        if tok == ("op", "**"):
+            exponent = _power_exponent(tokens, i)
+            if exponent is None:
+                return False
+            total *= max(abs(exponent), 1)
+            if total > MAX_POLY_DEGREE:
+                return False
+    return True
+
+def _sympy_equivalent(a, b):
+    """Slow path: symbolic expansion (accepts the same implicit-multiplication / ^ syntax)."""
+    sp = _sympy()
+    from sympy.parsing.sympy_parser import (
+        parse_expr, standard_transformations, implicit_multiplication_application, convert_xor,
+    )
+    transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
+    try:
+        a = parse_expr(a, transformations=transformations) if isinstance(a, str) else a
+        b = parse_expr(b, transformations=transformations) if isinstance(b, str) else b
+    except Exception:
+        return False
+    return sp.expand(a - b) == 0
+
+def check_factoring_answer(student_answer, solution):
+    """
+    True if the student's answer is the same polynomial as the solution.
+    Both may be raw strings or sympy expressions. Polynomials in x are
+    compared by exact coefficients; anything else falls back to sympy.
+    """
+    try:
+        return parse_polynomial(student_answer) == parse_polynomial(solution)
+    except PolynomialParseError:
+        return False
+    except _NotPolynomial:
+        if isinstance(student_answer, str) and not _small_powers(student_answer):
+            return False
+        return _sympy_equivalent(student_answer, solution)
+
+# randint ranges drawn for each difficulty: (a, b) for easy/medium,
+# (a, b, c) for hard where a/b becomes a fraction
+PARAM_RANGES = {
+    "easy": ((1,10), (1,10)),
+    "medium": ((1,20), (1,20)),
+    "hard": ((1,10), (1,10), (1,10)),
+}
+
+PROBLEM_TYPES = ("factoring", "quadratic")
+
+def make_rng(rng = None):
+    """
+    Resolve a seed / RNG argument: an int (or str) seed gives a private
+    random.Random, a Random instance is used as-is, None means the global
+    random module. Private generators keep concurrent requests independent.
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, random.Random):
+        return rng
+    return random.Random(rng)
 
-        d = Rational(a,b)               # a/b becomes the fraction
+def draw_params(difficulty = "easy", rng = None):
+    rng = make_rng(rng)
+    return tuple(rng.randint(lo, hi) for lo, hi in PARAM_RANGES[difficulty])
 
+def build_qfactor(difficulty, params):
+    sp, x = _sympy(), _symbol_x()
+    if difficulty == "hard":
+        a, b, c = params
+        d = sp.Rational(a, b)      # a/b is a fraction
+        factor = ((x + d) * (x + c))
+    else:
+        a, b = params
+        factor = ((x + a) * (x + b))
+
+    formula = sp.expand(factor)
+    return formula, factor      # returns the problem(formula) and solution(factor)
+
+def build_quad(difficulty, params):
+    sp, x = _sympy(), _symbol_x()
+    if difficulty == "hard":
+        a, b, c = params
+        d = sp.Rational(a,b)               # a/b becomes the fraction
         equation = ((x ** 2) + (d * x) + c)
-        solution = sp.solve(equation)           #return the roots of the quadratic
-        return equation, solution               #function returns the equation and solution
+        solution = roots_to_sympy(solve_quadratic(1, Fraction(a, b), c))     #return the roots of the quadratic
+    else:
+        a, b = params
+        equation = ((x ** 2) + (a * x) + b)
+        solution = roots_to_sympy(solve_quadratic(1, a, b))     #return the roots of the quadratic
 
-def generate_quad_problem1(problem_type = "factoring", difficulty = "easy"):
+    return equation, solution               #function returns the equation and solution
+
+def generate_qfactor(difficulty = "easy", rng = None):
+    if difficulty in PARAM_RANGES:
+        return build_qfactor(difficulty, draw_params(difficulty, rng))
+
+def generate_quad(difficulty = "easy", rng = None):
+    if difficulty in PARAM_RANGES:
+        return build_quad(difficulty, draw_params(difficulty, rng))
+
+def generate_quad_problem1(problem_type = "factoring", difficulty = "easy", rng = None):
     if problem_type == "factoring":
-        return generate_qfactor(difficulty)
+        return generate_qfactor(difficulty, rng)
     elif problem_type == "quadratic":
-        return generate_quad(difficulty)
+        return generate_quad(difficulty, rng)
     
 def check_answer(input ,answer, problem_type = "factoring"):
     if problem_type == "factoring":
-        user_ans = sp.expand(input)
-        solution = sp.expand(answer)
-        if (user_ans - solution == 0):
-            return True
-        else: return False
+        return check_factoring_answer(input, answer)
     
     if problem_type == "quadratic":
-        return set(sp.solve(input)) == set(answer)
+        sp = _sympy()
+        coeffs = _quadratic_coeffs(input)
+        if coeffs is not None:
+            return set(roots_to_sympy(solve_quadratic(*coeffs))) == set(answer)
+        return set(sp.solve(input)) == set(answer)     # not a rational quadratic
     
-def generate_problem_dict(problem_type = "factoring", difficulty = "easy"):      # JSON output
-    problem, solution = generate_quad_problem1(problem_type, difficulty)
+def make_problem_id(problem_type, difficulty, seed):
+    return f"{problem_type}-{difficulty}-{seed}"
+
+def parse_problem_id(problem_id):
+    """problem id -> (problem_type, difficulty, seed); raises ValueError if malformed."""
+    parts = str(problem_id).split("-", 2)
+    if (len(parts) != 3 or parts[0] not in PROBLEM_TYPES or parts[1] not in PARAM_RANGES
+            or not (parts[2].isascii() and parts[2].isdigit())):
+        raise ValueError(f"Invalid problem id: {problem_id}")
+    return parts[0], parts[1], int(parts[2])
+
+def generate_problem_dict(problem_type = "factoring", difficulty = "easy", rng = None):      # JSON output
+    # Every problem comes from its own seed, so its id is enough to rebuild it.
+    # An int rng is that seed; otherwise a random problem is served from the
+    # pre-built bank if there is one, else a fresh seed is drawn from rng
+    # (or the global generator).
+    if isinstance(rng, int):
+        seed = rng
+    else:
+        bank = problem_bank.get_bank()
+        if bank is not None:
+            return bank.random_problem_dict(problem_type, difficulty, make_rng(rng))
+        seed = make_rng(rng).getrandbits(32)
+    problem, solution = generate_quad_problem1(problem_type, difficulty, random.Random(seed))
 
         # if the quadratic solution are roots, turn them to strings here 
         
@@ -89,12 +446,184 @@ def generate_problem_dict(problem_type = "factoring", difficulty = "easy"):
         "Problem: ": str(problem),
         "Solution: ": str(solution),
         "Problem Type: ": problem_type,             
-        "Difficulty: ": difficulty                  #returns a set of data for each problem
+        "Difficulty: ": difficulty,                 #returns a set of data for each problem
+        "Problem ID: ": make_problem_id(problem_type, difficulty, seed),
     }
 
+def problem_from_id(problem_id):
+    """Regenerate the exact problem dict for an id from generate_problem_dict."""
+    problem_type, difficulty, seed = parse_problem_id(problem_id)
+    return generate_problem_dict(problem_type, difficulty, seed)
+
+def solution_from_id(problem_id):
+    return problem_from_id(problem_id)["Solution: "]
+
+# ---------------------------
+# Bulk generation (NumPy)
+# ---------------------------
+# Coefficients are drawn and expanded as arrays; the strings are formatted
+# exactly as str() of the sympy objects the single-problem generators return
+# (checked over every parameter combination), without importing sympy.
+
+def _fmt_rational(num, den):
+    return str(num) if den == 1 else f"{num}/{den}"
+
+def _fmt_x_term(num, den):
+    """Positive rational coefficient times x: x, 5*x, x/2, 23*x/10."""
+    term = "x" if num == 1 else f"{num}*x"
+    return term if den == 1 else f"{term}/{den}"
+
+def _fmt_surd(num, den, m):
+    """(num/den)*sqrt(m) for squarefree m != 1; negative m is imaginary (sqrt(39)*I/2, 2*I)."""
+    if m < 0:
+        base = "I" if m == -1 else f"sqrt({-m})*I"
+    else:
+        base = f"sqrt({m})"
+    term = base if num == 1 else f"{num}*{base}"
+    return term if den == 1 else f"{term}/{den}"
+
+def _squarefree_table(np, limit):
+    """(largest s with s*s | n, n // (s*s)) for n in 0..limit, as two arrays."""
+    n = np.arange(limit + 1)
+    square_root = np.ones(limit + 1, dtype=np.int64)
+    s = 2
+    while s * s <= limit:
+        square_root[(n % (s * s) == 0) & (n > 0)] = s
+        s += 1
+    return square_root, n // (square_root * square_root)
+
+def _bulk_qfactor(np, difficulty, params):
+    if difficulty == "hard":
+        a, b, c = params
+        g = np.gcd(a, b)
+        dn, dd = a // g, b // g                        # d = a/b reduced
+    else:
+        dn, c = params
+        dd = np.ones_like(dn)
+
+    # (x + d)(x + c) = x**2 + (d + c)x + d*c
+    lin_num = dn + c * dd                              # gcd(lin_num, dd) == gcd(dn, dd) == 1
+    const_num = dn * c
+    g = np.gcd(const_num, dd)
+    const_num, const_den = const_num // g, dd // g
+
+    problems = []
+    for dn_i, dd_i, c_i, ln, cn, cd in zip(*(v.tolist() for v in (dn, dd, c, lin_num, const_num, const_den))):
+        problem = f"x**2 + {_fmt_x_term(ln, dd_i)} + {_fmt_rational(cn, cd)}"
+        d = _fmt_rational(dn_i, dd_i)
+        if dd_i == 1 and dn_i == c_i:
+            solution = f"(x + {c_i})**2"
+        elif dn_i < c_i * dd_i:
+            solution = f"(x + {d})*(x + {c_i})"
+        else:
+            solution = f"(x + {c_i})*(x + {d})"
+        problems.append((problem, solution))
+    return problems
+
+def _bulk_quad(np, difficulty, params):
+    if difficulty == "hard":
+        a, b, c = params
+        g = np.gcd(a, b)
+        bn, bd = a // g, b // g                        # x coefficient a/b reduced
+    else:
+        bn, c = params
+        bd = np.ones_like(bn)
+
+    # roots of x**2 + (bn/bd)x + c:  (-bn ± sqrt(N)) / (2*bd),  N = bn**2 - 4*c*bd**2
+    disc = bn * bn - 4 * c * bd * bd
+    square_root, squarefree = _squarefree_table(np, int(np.abs(disc).max(initial=0)))
+    s = square_root[np.abs(disc)]
+    m = squarefree[np.abs(disc)] * np.sign(disc)
+    den = 2 * bd
+
+    g = np.gcd(bn, den)
+    p_num, p_den = -bn // g, den // g                  # real part -bn/(2bd)
+    g = np.gcd(s, den)
+    q_num, q_den = s // g, den // g                    # surd coefficient s/(2bd)
+
+    lo_num, hi_num = -bn - s, -bn + s                  # rational roots when m == 1
+    g_lo, g_hi = np.gcd(lo_num, den), np.gcd(hi_num, den)
+
+    columns = (bn, bd, c, disc, m, p_num, p_den, q_num, q_den,
+               lo_num // g_lo, den // g_lo, hi_num // g_hi, den // g_hi)
+    problems = []
+    for (bn_i, bd_i, c_i, disc_i, m_i, pn, pd, qn, qd,
+         lon, lod, hin, hid) in zip(*(v.tolist() for v in columns)):
+        problem = f"x**2 + {_fmt_x_term(bn_i, bd_i)} + {c_i}"
+        if disc_i == 0:
+            roots = [_fmt_rational(pn, pd)]
+        elif m_i == 1:
+            roots = [_fmt_rational(lon, lod), _fmt_rational(hin, hid)]
+        else:
+            p, q = _fmt_rational(pn, pd), _fmt_surd(qn, qd, m_i)
+            roots = [f"{p} - {q}", f"{p} + {q}"]
+        problems.append((problem, "[" + ", ".join(roots) + "]"))
+    return problems
+
+def generate_problems_bulk(problem_type = "factoring", difficulty = "easy", n = 100, seed = None):
+    """
+    Generate n problems at once as generate_problem_dict-style dicts, ids
+    included: problem_from_id rebuilds each one.
+
+    seed may be an int (or None for fresh entropy) or a numpy Generator;
+    the same seed always regenerates the same worksheet. Does not use sympy.
+    """
+    np = _numpy()
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+    if difficulty not in PARAM_RANGES:
+        raise ValueError(f"Unknown difficulty: {difficulty}")
+
+    params = [rng.integers(lo, hi + 1, size=n, dtype=np.int64) for lo, hi in PARAM_RANGES[difficulty]]
+    if problem_type == "factoring":
+        pairs = _bulk_qfactor(np, difficulty, params)
+    elif problem_type == "quadratic":
+        pairs = _bulk_quad(np, difficulty, params)
+    else:
+        raise ValueError(f"Unknown problem type: {problem_type}")
+
+    # Each problem gets the id generate_problem_dict gives the same parameters
+    seeds = problem_bank.seeds_by_params(difficulty)
+    return [
+        {
+            "Problem: ": problem,
+            "Solution: ": solution,
+            "Problem Type: ": problem_type,
+            "Difficulty: ": difficulty,
+            "Problem ID: ": make_problem_id(problem_type, difficulty, seeds[drawn]),
+        }
+        for (problem, solution), drawn in zip(pairs, zip(*(p.tolist() for p in params)))
+    ]
+
 def test_generator():
     for _ in range(5):
         p = generate_problem_dict("factoring")
         print(p)
 
+def benchmark_quadratic_solver(n = 200):
+    """Time sp.solve against solve_quadratic (+ conversion to sympy) on random generated quadratics."""
+    sp, x = _sympy(), _symbol_x()
+    params = [(random.randint(1,20), random.randint(1,20)) for _ in range(n)]
+    params += [(Fraction(random.randint(1,10), random.randint(1,10)), random.randint(1,10)) for _ in range(n)]
+    equations = [x**2 + sp.Rational(b.numerator, b.denominator) * x + c for b, c in params]
+
+    start = time.perf_counter()
+    for equation in equations:
+        sp.solve(equation)
+    sympy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for b, c in params:
+        solve_quadratic(1, b, c)
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for b, c in params:
+        roots_to_sympy(solve_quadratic(1, b, c))
+    fast_path_time = time.perf_counter() - start
+
+    per_call = lambda t: t / len(params) * 1e6
+    print(f"sp.solve:                        {per_call(sympy_time):9.1f} us/problem")
+    print(f"solve_quadratic:                 {per_call(exact_time):9.1f} us/problem  ({sympy_time / exact_time:.0f}x)")
+    print(f"solve_quadratic + roots_to_sympy:{per_call(fast_path_time):9.1f} us/problem  ({sympy_time / fast_path_time:.0f}x)")
+
 #print(generate_problem_dict())
@@ -0,0 +1,136 @@
+import cProfile
+import io
+import itertools
+import json
+import os
+import pstats
+import threading
+
+MODES = ("spans", "cprofile")
+
+# Only one cProfile may be active per process on newer Pythons
+_cprofile_lock = threading.Lock()
+
+
+class _RawStats:
+    """Adapter so pstats.Stats can load a stats dict shipped back from a worker."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profiled(fn, *args):
+    """
+    Run fn(*args) -> (response, timings) under cProfile and return
+    (response, timings, raw pstats dict). Module-level so process and
+    sandbox workers can unpickle it. Returns None for the stats when
+    another run is already being profiled.
+    """
+    if not _cprofile_lock.acquire(blocking=False):
+        return (*fn(*args), None)
+    try:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            response, timings = fn(*args)
+        finally:
+            profile.disable()
+        profile.create_stats()
+        return response, timings, profile.stats
+    finally:
+        _cprofile_lock.release()
+
+
+class Profiler:
+    """
+    Opt-in sampling profiler for the validate pipeline.
+
+    With every=N > 0, one in N uncached validations is sampled: its stage
+    timings (parse, extract_vars, check_prints, run, validator — measured by
+    Cpp_engine.timed anyway) are aggregated per lesson, and in "cprofile"
+    mode the engine run is also profiled and merged into one pstats.Stats.
+    With every=0, sample() is a single attribute check and nothing else runs.
+    """
+
+    def __init__(self, every=0, mode="spans"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.every = every
+        self.mode = mode
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def sample(self) -> bool:
+        """True for one in `every` calls (never when profiling is off)."""
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+    def reset(self):
+        with self._lock:
+            self.samples = 0
+            self.spans = {}  # (lesson_id, stage) -> [count, total seconds, max seconds]
+            self.stats = None
+
+    def add(self, lesson_id, timings, raw_stats=None):
+        with self._lock:
+            self.samples += 1
+            for stage, seconds in timings.items():
+                span = self.spans.get((lesson_id, stage))
+                if span is None:
+                    self.spans[(lesson_id, stage)] = [1, seconds, seconds]
+                else:
+                    span[0] += 1
+                    span[1] += seconds
+                    span[2] = max(span[2], seconds)
+            if raw_stats is not None:
+                if self.stats is None:
+                    self.stats = pstats.Stats(_RawStats(raw_stats))
+                else:
+                    self.stats.add(_RawStats(raw_stats))
+
+    def report(self, top=30, sort="cumulative"):
+        """
+        {"mode", "every", "samples", "spans": {lesson: {stage: {"count", "mean_ms",
+        "max_ms", "total_ms"}}}, "cprofile": top functions as pstats text or None}
+        """
+        with self._lock:
+            spans = {}
+            for (lesson_id, stage), (count, total, peak) in sorted(self.spans.items()):
+                spans.setdefault(lesson_id, {})[stage] = {
+                    "count": count,
+                    "mean_ms": total / count * 1000,
+                    "max_ms": peak * 1000,
+                    "total_ms": total * 1000,
+                }
+            text = None
+            if self.stats is not None:
+                out = io.StringIO()
+                self.stats.stream = out
+                self.stats.sort_stats(sort).print_stats(top)
+                text = out.getvalue()
+            return {
+                "mode": self.mode,
+                "every": self.every,
+                "samples": self.samples,
+                "spans": spans,
+                "cprofile": text,
+            }
+
+    def dump(self, path):
+        """Write report() as JSON to `path`, plus the raw cProfile data to `path`.pstats."""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        with self._lock:
+            if self.stats is not None:
+                self.stats.dump_stats(f"{path}.pstats")
+
+
+def profiler_from_env():
+    """Profiler from PROFILE_SAMPLE_EVERY (0 = off) and PROFILE_MODE ("spans" or "cprofile")."""
+    return Profiler(
+        every=int(os.environ.get("PROFILE_SAMPLE_EVERY", "0")),
+        mode=os.environ.get("PROFILE_MODE", "spans"),
+    )
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from cpp_parser import normalize_source
+
+
+class ResultCache:
+    """
+    Bounded, content-addressed cache for /validate responses.
+
+    Keys are a hash of (lesson id, normalized source), so byte-identical and
+    whitespace/comment-only variants of a submission share one entry.
+    Entries are evicted least-recently-used once `maxsize` is reached and
+    expire `ttl` seconds after being stored (ttl=None disables expiry), as
+    measured by `clock`.
+    """
+
+    def __init__(self, maxsize=2048, ttl=3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(lesson_id: str, code: str) -> str:
+        normalized = normalize_source(code)
+        return hashlib.sha256(f"{lesson_id}\0{normalized}".encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached value or None (counts a hit or a miss)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > self.clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires = self.clock() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,76 @@
+import pytest
+
+from Cpp_engine import evaluate_output
+from cpp_parser import normalize_source
+
+
+def test_raw_output_renders_every_cout_with_the_declared_values():
+    result = evaluate_output('int x = 5;\nif (x > 3) {\n    cout << "big";\n} else {\n    cout << x;\n}')
+    assert result["success"]
+    assert result["output"] == "big"
+    assert result["raw_output"] == "big\n5"
+
+
+def test_couts_that_need_the_run_do_not_fail_the_program():
+    # 6 / d divides by zero with d's declared value, but never at run time
+    result = evaluate_output("int d = 0;\nwhile (d < 3) {\n    d++;\n    cout << 6 / d;\n}")
+    assert result["success"]
+    assert result["output"] == result["raw_output"] == "632"
+
+
+@pytest.mark.parametrize("code, name, value", [
+    ("char c = 'A';\nint code = c;\ncout << code;", "code", 65),
+    ("double d = 2.5;\nint x = d * 2;\ncout << x;", "x", 5),
+    ("bool f = true;\nint x = f ? 1 : 2;\ncout << x;", "x", 1),
+])
+def test_declarations_of_other_types_are_in_scope(code, name, value):
+    result = evaluate_output(code)
+    assert result["success"]
+    assert result["output"] == result["raw_output"] == str(value)
+    # only the lesson types are reported
+    assert result["variables"] == {name: {"type": "int", "value": value}}
+
+
+@pytest.mark.parametrize("code, expected", [
+    # 6 / d divides by zero with d's declared value, but d is 1..3 when it runs
+    ("int d = 0;\nwhile (d < 3) {\n    d++;\n    int q = 6 / d;\n    cout << q;\n}", "632"),
+    # the division by zero is in a branch that never runs
+    ("int x = 5;\nif (x > 10) {\n    int y = 10 / (x - 5);\n}\ncout << x;", "5"),
+    # d is 2 by the time q is declared
+    ("int d = 0;\nd = 2;\nint q = 6 / d;\ncout << q;", "3"),
+])
+def test_declarations_that_may_run_with_other_values_do_not_fail_the_program(code, expected):
+    result = evaluate_output(code)
+    assert result["success"]
+    assert result["output"] == expected
+
+
+@pytest.mark.parametrize("code, error", [
+    ("int x = 5;\nint y = 10 / (x - 5);\ncout << x;",
+     "Invalid variable declaration: Invalid integer assignment for 'y': 10 / ( x - 5 )"),
+    ("int main() {\n    int age = abc;\n    cout << age;\n}",
+     "Invalid variable declaration: Invalid integer assignment for 'age': abc"),
+    ("int x = 5;\nif (x > 3) {\n    int y = 10 / (x - 5);\n}\ncout << x;", "Runtime error: Division by zero."),
+])
+def test_declarations_fail_the_program_when_they_run(code, error):
+    result = evaluate_output(code)
+    assert not result["success"]
+    assert result["error"] == error
+
+
+def test_errors_report_what_went_wrong():
+    result = evaluate_output("int x = 3;\ncout << y;")
+    assert not result["success"]
+    assert result["error"] == "Runtime error: Unknown identifier: y"
+
+
+@pytest.mark.parametrize("a, b", [
+    ("int age = 16;\nage = age   +;\ncout << age;", "int age = 16; age = age +; cout << age;"),
+    ("int age = (1 /* hi */ +);\ncout << age;", "int age = (1 +); cout << age;"),
+    ("int age = 16;\ncout << age /* x */ +;", "int age = 16; cout << age +;"),
+    ("int age = 16; // cout", "int age = 16;"),
+    ("int age = 16;\n" + "{" * 101 + "}" * 101, "int age = 16; " + "{" * 101 + "}" * 101),
+])
+def test_sources_sharing_a_cache_key_get_the_same_result(a, b):
+    assert normalize_source(a) == normalize_source(b)
+    assert evaluate_output(a) == evaluate_output(b)
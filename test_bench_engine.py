@@ -0,0 +1,38 @@
+import pytest
+
+import bench_engine
+from bench_engine import CALIBRATION, compare
+
+
+def result(min_us):
+    return {"calls": 10, "ops_per_sec": 1e6 / min_us, "min": min_us * 1e-6, "p50": min_us * 1e-6, "p99": min_us * 1e-6}
+
+
+def run(calibration_us=100, **cases_us):
+    return {CALIBRATION: result(calibration_us), **{name: result(us) for name, us in cases_us.items()}}
+
+
+def test_only_end_to_end_stages_count():
+    old = {"results": run(**{"a/x/evaluate_output": 100, "a/x/extract_vars": 10})}
+    ratios, change = compare(run(**{"a/x/evaluate_output": 100, "a/x/extract_vars": 40}), old)
+    assert ratios["a/x/extract_vars"] == 4
+    assert change == 1
+
+
+def test_change_is_the_geometric_mean_of_the_end_to_end_cases():
+    old = {"results": run(**{"a/x/evaluate_output": 100, "a/y/evaluate_output": 100})}
+    _, change = compare(run(**{"a/x/evaluate_output": 400, "a/y/evaluate_output": 100}), old)
+    assert change == pytest.approx(2)
+
+
+def test_a_slower_machine_is_scaled_down_but_a_faster_one_is_not_scaled_up():
+    old = {"results": run(**{"a/x/evaluate_output": 100})}
+    assert compare(run(200, **{"a/x/evaluate_output": 200}), old)[1] == pytest.approx(1)
+    assert compare(run(50, **{"a/x/evaluate_output": 100}), old)[1] == pytest.approx(1)
+
+
+def test_save_then_compare_on_the_same_tree_passes(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    args = ["-k", "/evaluate_output", "--baseline", path, "--min-time", "0.05"]
+    assert bench_engine.main(args + ["--save"]) == 0
+    assert bench_engine.main(args) == 0
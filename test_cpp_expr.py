@@ -0,0 +1,77 @@
+import pytest
+
+from cpp_expr import INT_MAX, INT_MIN, ExprError, compile_expr
+
+
+def evaluate(text, **scope):
+    return compile_expr(text).evaluate(scope)
+
+
+def render(text, **scope):
+    return compile_expr(text).render(scope)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2147483647 + 1", INT_MIN),
+    ("-2147483647 - 2", INT_MAX),
+    ("65536 * 65536", 0),
+    ("100000 * 100000", 1410065408),
+    ("1 << 31", INT_MIN),
+])
+def test_int_arithmetic_wraps_to_32_bits(text, expected):
+    assert evaluate(text) == expected
+
+
+def test_wrapping_applies_to_variables_and_increments():
+    assert evaluate("x * 2", x=INT_MAX) == -2
+    scope = {"x": INT_MAX}
+    compile_expr("x++").evaluate(scope)
+    assert scope["x"] == INT_MIN
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("7 / 2", 3),
+    ("-7 / 2", -3),
+    ("7 / -2", -3),
+    ("-7 / -2", 3),
+    ("7 % 3", 1),
+    ("-7 % 3", -1),
+    ("7 % -3", 1),
+    ("-7 % -3", -1),
+])
+def test_int_division_truncates_and_remainder_takes_dividend_sign(text, expected):
+    assert evaluate(text) == expected
+
+
+def test_float_division():
+    assert evaluate("7.0 / 2") == 3.5
+    assert evaluate("7 / 2.0") == 3.5
+    assert render("1.0 / 3") == "0.333333"
+
+
+@pytest.mark.parametrize("text", ["1 / 0", "1 % 0", "x / 0", "x % (x - x)"])
+def test_int_division_by_zero_is_an_error(text):
+    with pytest.raises(ExprError):
+        evaluate(text, x=4)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("(int) 3.9", 3),
+    ("(int) -3.9", -3),
+    ("int(2.5) / 2", 1),
+    ("static_cast<int>(7.9) % 4", 3),
+])
+def test_float_to_int_truncates_toward_zero(text, expected):
+    assert evaluate(text) == expected
+
+
+def test_modulo_needs_ints():
+    with pytest.raises(ExprError):
+        evaluate("7.5 % 2")
+
+
+def test_chars_print_as_characters_and_promote_to_int():
+    assert render("c", c=compile_expr("'A'").evaluate({})) == "A"
+    assert render("'A' + 1") == "66"
+    assert render("(char) ('A' + 1)") == "B"
+    assert render("s + '!'", s="hi") == "hi!"
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+import bench_corpus
+from Cpp_engine import evaluate_output
+from cpp_interpreter import MAX_STEPS, ExecutionError, LiveProgram, StepLimitExceeded, run_program
+from cpp_parser import MAX_NESTING
+
+
+def test_statements_run_in_source_order():
+    code = 'int x = 1;\nif (x > 0) { cout << "a"; }\nfor (int i = 0; i < 2; i++) { cout << i; }\ncout << "b";'
+    assert run_program(code) == "a01b"
+
+
+def test_break_leaves_only_the_innermost_loop():
+    code = (
+        "for (int i = 0; i < 3; i++) {\n"
+        "    for (int j = 0; j < 3; j++) {\n"
+        "        if (j == 1) { break; }\n"
+        "        cout << i << j << \" \";\n"
+        "    }\n"
+        "}"
+    )
+    assert run_program(code) == "00 10 20 "
+
+
+def test_continue_still_runs_the_for_update():
+    code = "for (int i = 0; i < 5; i++) {\n    if (i % 2 == 0) { continue; }\n    cout << i;\n}"
+    assert run_program(code) == "13"
+
+
+def test_break_and_continue_in_while():
+    code = (
+        "int i = 0;\n"
+        "while (true) {\n"
+        "    i++;\n"
+        "    if (i == 2) { continue; }\n"
+        "    if (i > 4) { break; }\n"
+        "    cout << i;\n"
+        "}"
+    )
+    assert run_program(code) == "134"
+
+
+def test_break_outside_a_loop_is_an_error():
+    with pytest.raises(ExecutionError):
+        run_program("int x = 1;\nbreak;")
+
+
+def test_block_locals_go_out_of_scope():
+    code = "int x = 1;\n{\n    int x = 2;\n    cout << x;\n}\ncout << x;"
+    assert run_program(code) == "21"
+
+
+def test_infinite_loop_exceeds_the_step_budget():
+    with pytest.raises(StepLimitExceeded) as e:
+        run_program('int i = 0;\nwhile (i < 3) {\n    cout << "x";\n}')
+    assert e.value.output.startswith("xxx")
+
+
+def test_step_budget_is_global_across_loops():
+    loop = "for (int i = 0; i < 2000; i++) { total += 1; }\n"
+    assert run_program("int total = 0;\n" + loop + "cout << total;") == "2000"
+    with pytest.raises(StepLimitExceeded):
+        run_program("int total = 0;\n" + loop * 5 + "cout << total;", max_steps=MAX_STEPS)
+
+
+def test_step_budget_can_be_lowered():
+    code = "int total = 0;\nfor (int i = 0; i < 10; i++) { total += i; }\ncout << total;"
+    assert run_program(code) == "45"
+    with pytest.raises(StepLimitExceeded):
+        run_program(code, max_steps=10)
+
+
+def test_deepest_allowed_nesting_runs():
+    depth = MAX_NESTING - 1
+    code = "int x = 0;\n" + "while (x < 1) { " * depth + "x++; cout << x;" + " }" * depth
+    assert run_program(code) == "1"
+
+
+def _edits(code, rng, count=15):
+    """Versions of code as it is typed line by line, then randomly edited."""
+    lines = code.split("\n")
+    versions = ["\n".join(lines[:n]) for n in range(1, len(lines) + 1)]
+    for _ in range(count):
+        current = versions[-1]
+        i = rng.randrange(len(current) + 1)
+        if rng.random() < 0.5:
+            current = current[:i] + current[i + 1:]
+        else:
+            current = current[:i] + rng.choice("0123;{}()+x \n") + current[i:]
+        versions.append(current)
+    return versions
+
+
+@pytest.mark.parametrize("lesson_id, case, code", bench_corpus.cases())
+def test_live_program_matches_a_full_run(lesson_id, case, code):
+    rng = random.Random(case)
+    session = LiveProgram()
+    for version in _edits(code, rng) + [code]:
+        with session.lock:
+            live = evaluate_output(version, session=session)
+        assert live == evaluate_output(version), version
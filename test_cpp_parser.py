@@ -0,0 +1,38 @@
+import pytest
+
+from Cpp_engine import evaluate_output
+from cpp_parser import MAX_NESTING, ParseError, parse_program
+
+
+def nested_ifs(depth):
+    return "int x = 1;\n" + "if (x > 0) " * depth + "cout << x;"
+
+
+def nested_blocks(depth):
+    return "int x = 1;\n" + "{" * depth + "cout << x;" + "}" * depth
+
+
+def test_nodes_carry_their_source_line():
+    program = parse_program("int x = 1;\nwhile (x < 3) {\n    x++;\n}\ncout << x;")
+    assert [node["line"] for node in program["body"]] == [1, 2, 5]
+    assert program["whiles"][0]["body"][0]["line"] == 3
+
+
+@pytest.mark.parametrize("nested", [nested_ifs, nested_blocks])
+def test_nesting_up_to_the_limit_parses(nested):
+    program = parse_program(nested(MAX_NESTING - 1))
+    assert len(program["couts"]) == 1
+
+
+@pytest.mark.parametrize("nested", [nested_ifs, nested_blocks])
+def test_nesting_past_the_limit_is_a_parse_error(nested):
+    with pytest.raises(ParseError):
+        parse_program(nested(MAX_NESTING + 1))
+
+
+@pytest.mark.parametrize("code", [nested_ifs(400), nested_blocks(1200)])
+def test_deep_nesting_is_reported_as_a_syntax_error(code):
+    # Used to raise RecursionError out of evaluate_output (a 500 from /validate)
+    result = evaluate_output(code)
+    assert result["success"] is False
+    assert result["error"].startswith("Syntax error:")
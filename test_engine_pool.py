@@ -0,0 +1,148 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from Cpp_engine import evaluate_timed
+from engine_pool import EnginePool, JobTimeout, PoolSaturated, SandboxExecutor, WorkerCrashed
+
+
+def double(x):
+    return x * 2
+
+
+# Sandbox jobs must unpickle in the worker without importing this module
+# (and with it the web app), so they are builtins or engine functions
+SPIN = (sum, range(10 ** 12))
+CODE = "int age = 16;\ncout << age;"
+
+
+def run(pool, fn, *args):
+    return asyncio.run(pool.run(fn, *args))
+
+
+@pytest.fixture
+def sandbox():
+    pools = []
+
+    def make(**kwargs):
+        pool = EnginePool("sandbox", **{"max_workers": 1, "timeout": 5.0, **kwargs})
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_full_queue_raises_pool_saturated():
+    pool = EnginePool("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        pool.submit(release.wait)
+        with pytest.raises(PoolSaturated):
+            run(pool, double, 1)
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_slot_is_released_when_the_job_finishes():
+    pool = EnginePool("thread", max_workers=1, max_queue=1)
+    try:
+        assert run(pool, double, 2) == 4
+        assert run(pool, double, 3) == 6
+        assert pool.queue_depth() == 0
+    finally:
+        pool.shutdown()
+
+
+def test_thread_job_past_its_deadline_raises_job_timeout():
+    pool = EnginePool("thread", max_workers=1, timeout=0.05)
+    try:
+        with pytest.raises(JobTimeout):
+            run(pool, time.sleep, 0.5)
+    finally:
+        pool.shutdown()
+
+
+def assert_worker_runs_jobs(pool):
+    result, timings = run(pool, evaluate_timed, CODE)
+    assert result["output"] == "16"
+
+
+def test_sandbox_job_past_its_deadline_is_killed_and_the_worker_replaced(sandbox):
+    pool = sandbox(timeout=0.5)
+    with pytest.raises(JobTimeout):
+        run(pool, *SPIN)
+    assert_worker_runs_jobs(pool)
+
+
+def test_sandbox_job_over_its_cpu_limit_crashes_the_worker(sandbox):
+    pool = sandbox(cpu_seconds=1, timeout=30.0)
+    with pytest.raises(WorkerCrashed):
+        run(pool, *SPIN)
+    assert_worker_runs_jobs(pool)
+
+
+def test_sandbox_job_over_its_memory_limit_crashes_the_worker(sandbox):
+    pool = sandbox(memory_bytes=32 * 1024 * 1024)
+    assert_worker_runs_jobs(pool)
+    with pytest.raises(WorkerCrashed):
+        run(pool, bytearray, 512 * 1024 * 1024)
+    assert_worker_runs_jobs(pool)
+
+
+def test_sandbox_worker_that_dies_is_replaced(sandbox):
+    pool = sandbox()
+    with pytest.raises(WorkerCrashed):
+        run(pool, os._exit, 1)
+    assert_worker_runs_jobs(pool)
+
+
+def test_sandbox_retries_spawning_with_backoff(monkeypatch):
+    spawn = SandboxExecutor._spawn
+    failures = []
+
+    def flaky_spawn(self):
+        if len(failures) < 3:
+            failures.append(time.monotonic())
+            raise OSError("fork failed")
+        return spawn(self)
+
+    monkeypatch.setattr(SandboxExecutor, "_spawn", flaky_spawn)
+    monkeypatch.setattr(SandboxExecutor, "SPAWN_BACKOFF", (0.05, 1.0))
+    executor = SandboxExecutor(max_workers=1, timeout=5.0)
+    try:
+        # Startup and the first job's retry fail: the job fails instead of hanging
+        with pytest.raises(WorkerCrashed):
+            executor.submit(len, "x").result(timeout=5)
+        # The next retry waits out the backoff, and once a worker starts jobs run again
+        with pytest.raises(WorkerCrashed):
+            executor.submit(len, "x").result(timeout=5)
+        assert executor.submit(len, "abc").result(timeout=5) == 3
+    finally:
+        executor.shutdown()
+    assert failures[2] - failures[1] >= 0.05
+
+
+@pytest.mark.parametrize("error, status", [
+    (PoolSaturated(), 503),
+    (JobTimeout(), 504),
+    (WorkerCrashed(), 422),
+])
+def test_pool_errors_map_to_http_statuses(monkeypatch, error, status):
+    async def failing_run(fn, *args):
+        raise error
+
+    monkeypatch.setattr(main.engine_pool, "run", failing_run)
+    client = TestClient(main.app)
+    code = f"int age = 16;\ncout << age; // {status}"
+    response = client.post("/validate", json={"lesson_id": "lesson1", "code": code})
+    assert response.status_code == status
+    if status == 503:
+        assert response.headers["Retry-After"] == main.RETRY_AFTER_SECONDS
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from profiling import Profiler
+from result_cache import ResultCache
+
+# Seconds a fresh interpreter may take to import the server (about 0.6s here)
+IMPORT_BUDGET = 3.0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def engine_runs(monkeypatch):
+    """Sources the engine pool was asked to run; the first lesson1 source finishes last."""
+    runs = []
+    run = main.engine_pool.run
+
+    async def counting_run(fn, *args):
+        runs.append(args[0])
+        if len(runs) == 1:
+            await asyncio.sleep(0.2)
+        return await run(fn, *args)
+
+    monkeypatch.setattr(main.engine_pool, "run", counting_run)
+    return runs
+
+
+def test_batch_runs_duplicates_once_and_answers_in_request_order(client, engine_runs):
+    correct = "int age = 16;\ncout << age;"
+    wrong = "int age = 15;\ncout << age;"
+    items = [
+        {"lesson_id": "lesson1", "code": correct},
+        {"lesson_id": "lesson1", "code": wrong},
+        {"lesson_id": "nope", "code": correct},
+        {"lesson_id": "lesson1", "code": "int age = 16;  // same\ncout << age;"},
+        {"lesson_id": "lesson1", "code": wrong},
+        {"lesson_id": "lesson2", "code": correct},
+    ]
+    response = client.post("/validate/batch", json={"items": items})
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == list(range(len(items)))
+    assert [line["success"] for line in lines] == [True, False, False, True, False, False]
+    assert lines[2]["feedback"] == "Invalid lesson ID."
+    # One run per (lesson, normalized source)
+    assert sorted(engine_runs) == sorted([correct, wrong, correct])
+
+
+def test_server_imports_quickly_and_without_sympy():
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import Cpp_engine, lesson_validators, main\n"
+        "print(time.perf_counter() - start, 'sympy' in sys.modules)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    seconds, sympy_loaded = out.split()
+    assert sympy_loaded == "False"
+    assert float(seconds) < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize("method", ["GET", "DELETE"])
+def test_admin_profile_is_404_when_profiling_is_off(client, monkeypatch, method):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "profiler", Profiler(every=0))
+    response = client.request(method, "/admin/profile", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("method", ["GET", "DELETE"])
+@pytest.mark.parametrize("token, headers", [
+    ("secret", {}),
+    ("secret", {"X-Admin-Token": "guess"}),
+    (None, {}),  # no token: localhost only, and the test client is not
+])
+def test_admin_profile_needs_the_admin_token(client, monkeypatch, method, token, headers):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", token)
+    monkeypatch.setattr(main, "profiler", Profiler(every=1))
+    assert client.request(method, "/admin/profile", headers=headers).status_code == 403
+
+
+def test_admin_profile_with_the_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(main, "profiler", Profiler(every=1))
+    headers = {"X-Admin-Token": "secret"}
+    assert client.get("/admin/profile", headers=headers).status_code == 200
+    assert client.delete("/admin/profile", headers=headers).json() == {"reset": True}
+
+
+def test_admin_profile_answers_localhost_without_a_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    monkeypatch.setattr(main, "profiler", Profiler(every=1))
+    local = TestClient(main.app, client=("127.0.0.1", 50000))
+    assert local.get("/admin/profile").status_code == 200
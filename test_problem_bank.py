@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+import problem_bank
+from problem_engine import generate_problem_dict, make_problem_id, problem_from_id
+
+
+@pytest.fixture
+def bank_path(tmp_path, monkeypatch):
+    """A bank of the easy problems (the full one takes seconds to build) as the default bank."""
+    path = str(tmp_path / "bank.sqlite3")
+    monkeypatch.setattr(problem_bank, "DIFFICULTIES", ("easy",))
+    problem_bank.build_bank(path)
+    monkeypatch.setattr(problem_bank, "DEFAULT_PATH", path)
+    monkeypatch.setattr(problem_bank, "_banks", {})
+    return path
+
+
+def test_every_stored_problem_regenerates_from_its_id(bank_path):
+    bank = problem_bank.get_bank()
+    for problem_type in problem_bank.PROBLEM_TYPES:
+        assert bank.count(problem_type, "easy") == 100
+        for index in range(bank.count(problem_type, "easy")):
+            seed, problem, solution = bank.get(problem_type, "easy", index)
+            regenerated = problem_from_id(make_problem_id(problem_type, "easy", seed))
+            assert (regenerated["Problem: "], regenerated["Solution: "]) == (problem, solution)
+
+
+def test_generation_is_served_from_the_bank(bank_path):
+    bank = problem_bank.get_bank()
+    for seed in range(20):
+        p = generate_problem_dict("quadratic", "easy", random.Random(seed))
+        assert p == bank.random_problem_dict("quadratic", "easy", random.Random(seed))
+        assert problem_from_id(p["Problem ID: "]) == p
+
+
+def test_missing_bank_is_not_built_inline(tmp_path, monkeypatch):
+    monkeypatch.setattr(problem_bank, "_banks", {})
+    missing = str(tmp_path / "missing.sqlite3")
+    assert problem_bank.get_bank(missing) is None
+    assert not (tmp_path / "missing.sqlite3").exists()
+
+    monkeypatch.setattr(problem_bank, "DEFAULT_PATH", missing)
+    p = generate_problem_dict("factoring", "easy", random.Random(1))
+    assert problem_from_id(p["Problem ID: "]) == p
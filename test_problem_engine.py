@@ -0,0 +1,88 @@
+import random
+import time
+from fractions import Fraction
+
+import pytest
+import sympy as sp
+
+from problem_engine import (
+    PARAM_RANGES, PROBLEM_TYPES, check_factoring_answer, generate_problem_dict, generate_problems_bulk,
+    parse_problem_id, problem_from_id, roots_to_sympy, solve_quadratic,
+)
+
+x = sp.Symbol("x")
+
+
+@pytest.mark.parametrize("a, b, c", [
+    (1, -5, 6),  # two rational roots
+    (2, -3, 1),
+    (1, -4, 4),  # double root
+    (4, 4, 1),
+    (1, 0, -2),  # irrational roots
+    (2, 3, -1),
+    (Fraction(1, 2), Fraction(-1, 3), Fraction(-1, 5)),
+    (1, 2, 5),  # complex roots
+    (3, 1, 1),
+    (-1, 0, -8),
+])
+def test_solve_quadratic_matches_sympy(a, b, c):
+    expected = sp.solve(sp.Rational(a) * x**2 + sp.Rational(b) * x + sp.Rational(c), x)
+    assert roots_to_sympy(solve_quadratic(a, b, c)) == expected
+
+
+@pytest.mark.parametrize("answer", [
+    "9**9**9",
+    "2**200000",
+    "1e400",
+    "x**9**9**9",
+    "(x + 1)**(60*60*60)",
+    "(" * 5000 + "x" + ")" * 5000,
+])
+def test_hostile_factoring_answers_are_rejected_promptly(answer):
+    start = time.perf_counter()
+    assert check_factoring_answer(answer, "(x + 1)*(x + 2)") is False
+    assert time.perf_counter() - start < 2
+
+
+@pytest.mark.parametrize("answer, solution", [
+    ("x**-1", "1/x"),
+    ("x**(-2) + 1", "1 + 1/x**2"),
+    ("(x + 3)(x + 2)", "x**2 + 5*x + 6"),
+    ("x^2 + 23x/10 + 3/5", "(x + 3/10)*(x + 2)"),
+])
+def test_equivalent_factoring_answers_are_accepted(answer, solution):
+    assert check_factoring_answer(answer, solution) is True
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+@pytest.mark.parametrize("difficulty", list(PARAM_RANGES))
+def test_bulk_generation_is_reproducible_and_matches_single_generation(problem_type, difficulty):
+    problems = generate_problems_bulk(problem_type, difficulty, n=50, seed=7)
+    assert problems == generate_problems_bulk(problem_type, difficulty, n=50, seed=7)
+    for p in problems:
+        _, _, seed = parse_problem_id(p["Problem ID: "])
+        assert generate_problem_dict(problem_type, difficulty, seed) == p
+
+
+@pytest.mark.parametrize("problem_type", PROBLEM_TYPES)
+@pytest.mark.parametrize("difficulty", list(PARAM_RANGES))
+def test_problem_ids_round_trip(problem_type, difficulty):
+    for seed in range(5):
+        p = generate_problem_dict(problem_type, difficulty, random.Random(seed))
+        assert problem_from_id(p["Problem ID: "]) == p
+
+
+@pytest.mark.parametrize("problem_id", [
+    "quadratic-hard-x",
+    "quadratic-hard-",
+    "quadratic-hard--5",
+    "quadratic-hard- 5",
+    "quadratic-hard",
+    "cubic-easy-5",
+    "factoring-extreme-5",
+    "",
+    None,
+])
+def test_malformed_problem_ids_are_rejected(problem_id):
+    with pytest.raises(ValueError):
+        problem_from_id(problem_id)
@@ -0,0 +1,69 @@
+from result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hits_and_misses_are_counted():
+    cache = ResultCache(maxsize=4)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResultCache(maxsize=4, ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_no_ttl_never_expires():
+    clock = FakeClock()
+    cache = ResultCache(maxsize=4, ttl=None, clock=clock)
+    cache.put("a", 1)
+    clock.now = 1e9
+    assert cache.get("a") == 1
+
+
+def test_zero_size_disables_caching():
+    cache = ResultCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_key_ignores_whitespace_and_comments():
+    key = ResultCache.key("lesson1", "int age = 16;\ncout << age;")
+    assert ResultCache.key("lesson1", "int age=16; // the age\ncout<<age;") == key
+    assert ResultCache.key("lesson1", "/* x */ int  age = 16 ;\n\n  cout << age ;") == key
+
+
+def test_key_depends_on_lesson_and_tokens():
+    key = ResultCache.key("lesson1", "int age = 16; cout << age;")
+    assert ResultCache.key("lesson2", "int age = 16; cout << age;") != key
+    assert ResultCache.key("lesson1", "int age = 17; cout << age;") != key
+    assert ResultCache.key("lesson1", 'string s = "a b"; cout << s;') != ResultCache.key(
+        "lesson1", 'string s = "a  b"; cout << s;')